@@ -0,0 +1,249 @@
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sqlalchemy import func
+
+from database import SessionLocal, engine
+from metrics import calculate_metrics
+from models import Base, Location, LocationGHI, BacktestScore
+
+# === ORDEN DE LOS MESES (como se guardan en location_ghi) ===
+MONTH_ORDER = [
+    "ENERO", "FEBRERO", "MARZO", "ABRIL", "MAYO", "JUNIO",
+    "JULIO", "AGOSTO", "SEPTIEMBRE", "OCTUBRE", "NOVIEMBRE", "DICIEMBRE"
+]
+PERIODO = 12  # estacionalidad anual en datos mensuales
+
+
+# === MÉTODOS DE PRONÓSTICO ===
+# Todos reciben la historia (np.ndarray, índice 0 = primer mes de la serie)
+# y el horizonte en meses; devuelven un np.ndarray de largo `horizonte`.
+
+def pronostico_naive(historia: np.ndarray, horizonte: int) -> np.ndarray:
+    """Repite el último valor observado."""
+    return np.full(horizonte, historia[-1])
+
+
+def pronostico_estacional_naive(historia: np.ndarray, horizonte: int) -> np.ndarray:
+    """Repite el valor del mismo mes del año anterior."""
+    ultimo_anio = historia[-PERIODO:]
+    return ultimo_anio[np.arange(horizonte) % PERIODO]
+
+
+def pronostico_media_estacional(historia: np.ndarray, horizonte: int) -> np.ndarray:
+    """Promedio histórico del mismo mes calendario."""
+    n = len(historia)
+    medias = np.array([historia[p::PERIODO].mean() for p in range(PERIODO)])
+    return medias[(n + np.arange(horizonte)) % PERIODO]
+
+
+def pronostico_drift(historia: np.ndarray, horizonte: int) -> np.ndarray:
+    """Extiende la pendiente promedio entre el primer y el último valor."""
+    pendiente = (historia[-1] - historia[0]) / max(len(historia) - 1, 1)
+    return historia[-1] + pendiente * np.arange(1, horizonte + 1)
+
+
+def pronostico_holt_winters(historia: np.ndarray, horizonte: int,
+                            alpha: float = 0.3, beta: float = 0.05, gamma: float = 0.2) -> np.ndarray:
+    """Holt-Winters aditivo con parámetros fijos (necesita al menos dos años)."""
+    n = len(historia)
+    if n < 2 * PERIODO:
+        return pronostico_estacional_naive(historia, horizonte)
+
+    nivel = historia[:PERIODO].mean()
+    tendencia = (historia[PERIODO:2 * PERIODO].mean() - nivel) / PERIODO
+    estacion = historia[:PERIODO] - nivel
+
+    for t in range(n):
+        s = estacion[t % PERIODO]
+        nivel_anterior = nivel
+        nivel = alpha * (historia[t] - s) + (1 - alpha) * (nivel + tendencia)
+        tendencia = beta * (nivel - nivel_anterior) + (1 - beta) * tendencia
+        estacion[t % PERIODO] = gamma * (historia[t] - nivel) + (1 - gamma) * s
+
+    h = np.arange(1, horizonte + 1)
+    return nivel + h * tendencia + estacion[(n + h - 1) % PERIODO]
+
+
+METODOS = {
+    "naive": pronostico_naive,
+    "seasonal_naive": pronostico_estacional_naive,
+    "media_estacional": pronostico_media_estacional,
+    "drift": pronostico_drift,
+    "holt_winters": pronostico_holt_winters,
+}
+
+
+# === CARGA DE SERIES DESDE LA BD ===
+def cargar_series(session):
+    """
+    Devuelve {municipality_id: serie} con el GHI mensual (kWh/m²/día) de cada
+    municipio, promediando sus ubicaciones y ordenado cronológicamente.
+    Los meses faltantes dentro de la serie se interpolan linealmente.
+    """
+    rows = (
+        session.query(
+            Location.municipality_id,
+            LocationGHI.year,
+            LocationGHI.month,
+            func.avg(LocationGHI.value_kwh),
+        )
+        .join(LocationGHI, LocationGHI.location_id == Location.id)
+        .filter(LocationGHI.month.in_(MONTH_ORDER))
+        .group_by(Location.municipality_id, LocationGHI.year, LocationGHI.month)
+        .all()
+    )
+
+    por_municipio = {}
+    for mun_id, year, month, value in rows:
+        indice = year * PERIODO + MONTH_ORDER.index(month)
+        por_municipio.setdefault(mun_id, {})[indice] = value
+
+    series = {}
+    for mun_id, valores in por_municipio.items():
+        inicio, fin = min(valores), max(valores)
+        posiciones = np.array(sorted(valores))
+        observados = np.array([valores[p] for p in posiciones])
+        series[mun_id] = np.interp(np.arange(inicio, fin + 1), posiciones, observados)
+
+    return series
+
+
+# === EVALUACIÓN (se ejecuta dentro de los procesos del pool) ===
+def evaluar_serie(serie: np.ndarray, horizonte: int, min_entrenamiento: int, paso: int, metodos):
+    """
+    Validación cruzada con origen móvil: para cada origen se entrena con
+    serie[:origen] y se pronostican los `horizonte` meses siguientes.
+    """
+    origenes = range(min_entrenamiento, len(serie) - horizonte + 1, paso)
+    resultados = []
+
+    for nombre in metodos:
+        metodo = METODOS[nombre]
+        reales, predichos = [], []
+        for origen in origenes:
+            reales.append(serie[origen:origen + horizonte])
+            predichos.append(metodo(serie[:origen], horizonte))
+
+        if not reales:
+            continue
+
+        metricas = calculate_metrics(np.concatenate(reales), np.concatenate(predichos))
+        if not np.isfinite([metricas["MAE"], metricas["RMSE"]]).all():
+            # Un método que no pudo pronosticar (NaN/inf) no entra al ranking
+            continue
+        resultados.append({"method": nombre, "folds": len(reales), **metricas})
+
+    resultados.sort(key=lambda r: r["RMSE"])
+    for posicion, r in enumerate(resultados, start=1):
+        r["rank"] = posicion
+    return resultados
+
+
+def _evaluar_municipio(tarea):
+    mun_id, serie, horizonte, min_entrenamiento, paso, metodos = tarea
+    return mun_id, evaluar_serie(serie, horizonte, min_entrenamiento, paso, metodos)
+
+
+# === PERSISTENCIA DE LEADERBOARDS ===
+def guardar_leaderboards(session, leaderboards, horizonte):
+    mun_ids = list(leaderboards)
+    session.query(BacktestScore).filter(
+        BacktestScore.municipality_id.in_(mun_ids),
+        BacktestScore.horizon == horizonte,
+    ).delete(synchronize_session=False)
+
+    session.add_all([
+        BacktestScore(
+            municipality_id=mun_id,
+            method=r["method"],
+            horizon=horizonte,
+            folds=r["folds"],
+            mae=r["MAE"],
+            rmse=r["RMSE"],
+            mape=r["MAPE (%)"],
+            r2=r["R2"],
+            rank=r["rank"],
+        )
+        for mun_id, resultados in leaderboards.items()
+        for r in resultados
+    ])
+    session.commit()
+
+
+def leaderboard_municipio(session, municipality_id: int, horizonte: int):
+    scores = (
+        session.query(BacktestScore)
+        .filter_by(municipality_id=municipality_id, horizon=horizonte)
+        .order_by(BacktestScore.rank)
+        .all()
+    )
+    return [
+        {
+            "rank": s.rank,
+            "metodo": s.method,
+            "origenes_evaluados": s.folds,
+            "metricas": {"MAE": s.mae, "RMSE": s.rmse, "MAPE (%)": s.mape, "R2": s.r2},
+            "fecha": s.created_at.isoformat(),
+        }
+        for s in scores
+    ]
+
+
+# === BACKTEST NACIONAL ===
+def ejecutar_backtest(horizonte=12, min_entrenamiento=24, paso=1, metodos=None, max_workers=None):
+    """
+    Corre el backtest de todos los municipios repartiendo el trabajo en un
+    pool de procesos y guarda el leaderboard de cada municipio.
+    """
+    if min_entrenamiento < PERIODO:
+        raise ValueError(f"min_entrenamiento debe ser al menos {PERIODO} meses (un ciclo estacional)")
+    if horizonte < 1 or paso < 1:
+        raise ValueError("horizonte y paso deben ser al menos 1")
+    metodos = list(metodos or METODOS)
+    Base.metadata.create_all(engine, tables=[BacktestScore.__table__])
+
+    session = SessionLocal()
+    try:
+        inicio = time.perf_counter()
+        series = cargar_series(session)
+        tareas = [
+            (mun_id, serie, horizonte, min_entrenamiento, paso, metodos)
+            for mun_id, serie in series.items()
+            if len(serie) >= min_entrenamiento + horizonte
+        ]
+        if not tareas:
+            print("⚠️ No hay series con suficiente historia para el backtest")
+            return {}
+
+        max_workers = max_workers or os.cpu_count() or 1
+        chunksize = max(1, len(tareas) // (max_workers * 4))
+        print(f"📊 Backtest de {len(tareas)} municipios con {len(metodos)} métodos en {max_workers} procesos...")
+
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            leaderboards = dict(pool.map(_evaluar_municipio, tareas, chunksize=chunksize))
+
+        guardar_leaderboards(session, leaderboards, horizonte)
+        print(f"✅ Backtest completado en {time.perf_counter() - inicio:.1f}s")
+        return leaderboards
+    finally:
+        session.close()
+
+
+# === EJECUCIÓN ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest con origen móvil de los métodos de pronóstico de GHI")
+    parser.add_argument("--horizonte", type=int, default=12, help="Meses a pronosticar por origen")
+    parser.add_argument("--min-entrenamiento", type=int, default=24, help="Meses mínimos de historia")
+    parser.add_argument("--paso", type=int, default=1, help="Meses entre orígenes consecutivos")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos del pool (por defecto todos los núcleos)")
+    args = parser.parse_args()
+    if args.min_entrenamiento < PERIODO:
+        parser.error(f"--min-entrenamiento debe ser al menos {PERIODO}")
+    if args.horizonte < 1 or args.paso < 1:
+        parser.error("--horizonte y --paso deben ser al menos 1")
+
+    ejecutar_backtest(args.horizonte, args.min_entrenamiento, args.paso, max_workers=args.workers)
@@ -0,0 +1,140 @@
+import sys
+import time
+import socket
+import asyncio
+import argparse
+import subprocess
+
+import httpx
+
+from database import SessionLocal
+from models import Department, Municipality
+
+
+# === ESCENARIOS: ENDPOINTS REALES DE LA API ===
+# Se mezclan handlers async (motor aiosqlite o índice en memoria) y sync (threadpool)
+# para ver cómo se comportan bajo la misma concurrencia.
+def escenarios(year: int):
+    db = SessionLocal()
+    try:
+        municipios = [m.name for m in db.query(Municipality).all()]
+        departamentos = [d.name for d in db.query(Department).all()]
+    finally:
+        db.close()
+
+    return {
+        "GET /municipalities/{name}/range (async)": [
+            f"/municipalities/{m}/range?start_month=enero&end_month=diciembre&year={year}" for m in municipios
+        ],
+        "GET /departments/{name} (sync)": [f"/departments/{d}?year={year}" for d in departamentos],
+        "GET /locations (async, caché)": [f"/locations?year={year}"],
+        "GET /autocomplete (async, memoria)": [f"/autocomplete?q={m[:3]}" for m in municipios],
+    }
+
+
+def _percentil(tiempos, p):
+    ordenados = sorted(tiempos)
+    return ordenados[min(int(len(ordenados) * p), len(ordenados) - 1)] * 1000
+
+
+def _reporte(nombre, tiempos, errores, total):
+    if not tiempos:
+        print(f"{nombre}: sin respuestas ({errores} errores)")
+        return
+    print(
+        f"{nombre}\n"
+        f"    {len(tiempos) / total:8.1f} req/s | p50 {_percentil(tiempos, 0.5):7.1f} ms | "
+        f"p95 {_percentil(tiempos, 0.95):7.1f} ms | p99 {_percentil(tiempos, 0.99):7.1f} ms | "
+        f"errores {errores}"
+    )
+
+
+# La latencia se mide por petición HTTP completa (cliente → uvicorn → handler → BD → respuesta),
+# desde que uno de los `concurrencia` clientes la emite.
+async def medir(client, rutas, requests, concurrencia):
+    semaforo = asyncio.Semaphore(concurrencia)
+    tiempos, errores = [], 0
+
+    async def una(ruta):
+        nonlocal errores
+        async with semaforo:
+            inicio = time.perf_counter()
+            try:
+                response = await client.get(ruta)
+            except httpx.HTTPError:
+                errores += 1
+                return
+            if response.status_code >= 500:
+                errores += 1
+                return
+            tiempos.append(time.perf_counter() - inicio)
+
+    # Calentamiento: conexiones abiertas y cachés de la API llenas
+    await asyncio.gather(*(una(r) for r in rutas[:concurrencia]))
+    tiempos.clear()
+    errores = 0
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(una(rutas[i % len(rutas)]) for i in range(requests)))
+    return tiempos, errores, time.perf_counter() - inicio
+
+
+async def benchmark(url, year, requests, concurrencia):
+    limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+    async with httpx.AsyncClient(base_url=url, limits=limites, timeout=60) as client:
+        for nombre, rutas in escenarios(year).items():
+            tiempos, errores, total = await medir(client, rutas, requests, concurrencia)
+            _reporte(nombre, tiempos, errores, total)
+
+
+# === SERVIDOR LOCAL (si no se indica --url) ===
+# En otro proceso, para que el cliente no compita por el GIL con la API medida.
+_SERVIDOR = (
+    "import sys, uvicorn; from endpoints import Enpoints; "
+    "uvicorn.run(Enpoints().app, host='127.0.0.1', port=int(sys.argv[1]), log_level='warning')"
+)
+
+
+def iniciar_servidor():
+    from tiles import regenerar_tiles
+
+    # Los tiles se generan antes: si no, la regeneración de arranque compite con la medición
+    regenerar_tiles()
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        puerto = s.getsockname()[1]
+
+    url = f"http://127.0.0.1:{puerto}"
+    proceso = subprocess.Popen([sys.executable, "-c", _SERVIDOR, str(puerto)])
+    while True:
+        if proceso.poll() is not None:
+            raise RuntimeError("La API no pudo arrancar")
+        try:
+            httpx.get(f"{url}/", timeout=1)
+            return proceso, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+
+
+# === EJECUCIÓN ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mide latencia y throughput de los endpoints de lectura de la API")
+    parser.add_argument("--url", default=None, help="API ya levantada (por defecto se levanta una local con uvicorn)")
+    parser.add_argument("--year", type=int, default=2020, help="Año consultado")
+    parser.add_argument("--requests", type=int, default=2000, help="Peticiones por endpoint")
+    parser.add_argument("--concurrencia", type=int, default=100, help="Clientes simultáneos")
+    args = parser.parse_args()
+
+    proceso = None
+    url = args.url
+    if url is None:
+        proceso, url = iniciar_servidor()
+
+    print(f"📊 {args.requests} peticiones por endpoint, {args.concurrencia} clientes, contra {url}")
+    try:
+        asyncio.run(benchmark(url, args.year, args.requests, args.concurrencia))
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            proceso.wait()
@@ -1,14 +1,31 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 
 # 👉 aquí usas tu motor, para pruebas sqlite es lo más simple
 SQLALCHEMY_DATABASE_URL = "sqlite:///./ghi.db"
+ASYNC_SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./ghi.db"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 
+# Motor async para los endpoints de lectura (no ocupan un hilo de la API durante la
+# consulta). Cada conexión aiosqlite tiene su propio hilo, así que el pool es chico;
+# hay que llamar a `async_engine.dispose()` al apagar (ver Enpoints).
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, pool_size=5, max_overflow=5)
+
+# WAL: las lecturas de la API no se bloquean mientras una ingesta escribe
+@event.listens_for(engine, "connect")
+@event.listens_for(async_engine.sync_engine, "connect")
+def _set_sqlite_pragma(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
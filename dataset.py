@@ -1,7 +1,7 @@
 import time
-import requests
 import pandas as pd
-from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey, UniqueConstraint
+from nasa_client import nasa_client, NasaPowerError, CircuitOpenError
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import sessionmaker, relationship, declarative_base
 
 # === MODELOS DE DATOS ===
@@ -45,7 +45,8 @@ class LocationGHI(Base):
 
 
 # === CONFIGURACIÓN DE LA BASE DE DATOS ===
-engine = create_engine("sqlite:///ghi.db")
+# Mismo motor que la API (modo WAL) para que las lecturas no se bloqueen durante la ingesta
+from database import engine
 Base.metadata.create_all(engine) # Crea las tablas si no existen
 Session = sessionmaker(bind=engine)
 
@@ -63,74 +64,96 @@ def get_ghi_monthly(lat, lon, start_year=2019, end_year=2023):
     lat = round(lat, 3)
     lon = round(lon, 3)
 
-    # URL de la API de NASA POWER para datos mensuales
-    # Utiliza 'start' y 'end' en formato YYYY para obtener todos los meses de esos años
-    url = (
-        f"https://power.larc.nasa.gov/api/temporal/monthly/point"
-        f"?latitude={lat}"
-        f"&longitude={lon}"
-        f"&start={start_year}"
-        f"&end={end_year}"
-        f"&community=RE"  # 'SB' para "Surface and Solar"
-        f"&parameters=ALLSKY_SFC_SW_DWN" # GHI: Irradiación Solar Horizontal de Cielo Completo en la Superficie
-        f"&format=json"
-    )
-
+    # El cliente compartido reutiliza conexiones y reintenta con backoff los errores transitorios
     try:
         print(f"📡 Consultando NASA POWER para Lat: {lat}, Lon: {lon} (Años: {start_year}-{end_year})")
-        response = requests.get(url, timeout=30) # Aumentar timeout por si la API tarda
-
-        if response.status_code == 200:
-            data = response.json()
-            # La clave de los datos GHI es 'allsky_sfc_sw_dwn'
-            # y los datos vienen en un diccionario donde la clave es "YYYYMM"
-            if "properties" in data and "parameter" in data["properties"] and "ALLSKY_SFC_SW_DWN" in data["properties"]["parameter"]:
-                return data["properties"]["parameter"]["ALLSKY_SFC_SW_DWN"]
-            else:
-                print(f"⚠️ No se encontraron datos GHI en la respuesta de la API para Lat: {lat}, Lon: {lon}")
-                return None
-        else:
-            print(f"❌ Error en la API de NASA POWER ({response.status_code}): {response.text}")
-            return None
-
-    except requests.exceptions.Timeout:
-        print(f"❌ Timeout al consultar NASA API para Lat: {lat}, Lon: {lon}")
-        return None
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error de conexión con NASA API para Lat: {lat}, Lon: {lon}: {e}")
+        # Los datos vienen en un diccionario donde la clave es "YYYYMM"
+        return nasa_client.monthly(lat, lon, start_year, end_year)
+    except CircuitOpenError:
+        raise  # La API está caída: quien llama decide si espera (ver esperar_ghi_monthly)
+    except NasaPowerError as e:
+        print(f"❌ Error en la API de NASA POWER para Lat: {lat}, Lon: {lon}: {e}")
         return None
     except Exception as e:
         print(f"❌ Error inesperado al procesar datos de NASA API para Lat: {lat}, Lon: {lon}: {e}")
         return None
 
+class IngestaCancelada(Exception):
+    """Se pidió cancelar la ingesta mientras se esperaba a NASA POWER."""
+
+
+def esperar_ghi_monthly(lat, lon, should_cancel=None):
+    """
+    Como `get_ghi_monthly`, pero si el circuit breaker está abierto espera
+    `retry_after` y reintenta la misma ubicación en vez de seguir sin GHI.
+    """
+    while True:
+        try:
+            return get_ghi_monthly(lat, lon)
+        except CircuitOpenError as e:
+            print(f"⏳ NASA POWER no disponible, reintentando en {e.retry_after:.0f}s...")
+            fin = time.monotonic() + e.retry_after
+            while time.monotonic() < fin:
+                if should_cancel and should_cancel():
+                    raise IngestaCancelada()
+                time.sleep(max(min(fin - time.monotonic(), 1), 0))
+
+
 # === PROCESAR EL ARCHIVO CSV ===
-def process_file(file_path):
+# `on_progress(procesadas, total, error, confirmada)` se llama después de cada fila (error=None si se
+# guardó; confirmada=True si la fila quedó con commit)
+# y `should_cancel()` se consulta antes de cada fila; ambos son opcionales (los usa ingestion.py).
+def process_file(file_path, on_progress=None, should_cancel=None, pause=4):
     session = Session() # Inicia una sesión por cada ejecución del proceso
+    # "confirmadas": filas con commit (aunque falte el GHI); "guardadas": además con GHI
+    resumen = {"total": 0, "procesadas": 0, "guardadas": 0, "confirmadas": 0, "cancelado": False, "error": None}
+
+    def reportar(error=None, confirmada=True):
+        resumen["procesadas"] += 1
+        if confirmada:
+            resumen["confirmadas"] += 1
+        if error is None:
+            resumen["guardadas"] += 1
+        if on_progress:
+            on_progress(resumen["procesadas"], resumen["total"], error, confirmada)
 
     try:
-        # Leer CSV (asegurar separador por comas si es un CSV real)
-        # Si tu archivo es realmente un Excel, deberías usar pd.read_excel(file_path)
-        df = pd.read_csv(file_path)
+        # Leer CSV (asegurar separador por comas si es un CSV real) o Excel según la extensión
+        if str(file_path).lower().endswith((".xlsx", ".xls")):
+            df = pd.read_excel(file_path)
+        else:
+            df = pd.read_csv(file_path)
         df.columns = df.columns.str.strip()  # Limpiar espacios en nombres de columnas
 
         # Asegúrate de que los nombres de las columnas coincidan exactamente con tu Excel/CSV
         required_cols = ["Municipio", "Departamento", "Latitud", "Longitud"]
         if not all(col in df.columns for col in required_cols):
-            print(f"❌ Error: El archivo debe contener las columnas: {', '.join(required_cols)}")
-            return
+            resumen["error"] = f"El archivo debe contener las columnas: {', '.join(required_cols)}"
+            print(f"❌ Error: {resumen['error']}")
+            return resumen
 
         # Eliminar filas con valores nulos en las columnas importantes y duplicados
         df = df[required_cols].drop_duplicates().dropna(subset=["Municipio", "Departamento", "Latitud", "Longitud"])
         
+        resumen["total"] = len(df)
         print(f"📦 Procesando {len(df)} entradas de municipios/ubicaciones del archivo '{file_path}'...")
 
         for idx, row in df.iterrows():
+            if should_cancel and should_cancel():
+                resumen["cancelado"] = True
+                print(f"⏹️ Proceso cancelado tras {resumen['procesadas']} de {resumen['total']} filas")
+                break
+
             try:
                 dep_name = str(row["Departamento"]).strip()
                 mun_name = str(row["Municipio"]).strip()
                 lat = float(row["Latitud"])
                 lon = float(row["Longitud"])
 
+                # --- Consultar NASA API para los datos GHI ---
+                # Antes de tocar la BD: si hay que esperar al breaker no se retiene la escritura
+                ghi_data = esperar_ghi_monthly(lat, lon, should_cancel)
+
                 # --- Obtener o crear Departamento ---
                 department = session.query(Department).filter_by(name=dep_name).first()
                 if not department:
@@ -164,10 +187,10 @@ def process_file(file_path):
                     session.add(location)
                     session.flush()
 
-                # --- Consultar NASA API para los datos GHI ---
-                ghi_data = get_ghi_monthly(lat, lon)
                 if not ghi_data:
                     print(f"⚠️ No se pudo obtener GHI para {mun_name} (Lat: {lat}, Lon: {lon}). Saltando...")
+                    session.commit() # Conservar departamento/municipio/ubicación aunque falte el GHI
+                    reportar(f"Sin datos GHI para {mun_name} (Lat: {lat}, Lon: {lon})")
                     continue
 
                 # --- Guardar cada mes y año de los datos GHI ---
@@ -207,22 +230,32 @@ def process_file(file_path):
 
                 session.commit() # Commit para guardar los cambios de esta ubicación y sus GHI
                 print(f"✅ GHI guardado/actualizado para {mun_name}, {dep_name} (Lat: {lat}, Lon: {lon})")
+                reportar()
 
                 # ⏸️ Pausa para respetar los límites de la API de NASA POWER
                 # La API de NASA tiene un límite de 1000 solicitudes por hora por IP.
                 # Una pausa de 1.5 a 2 segundos es buena práctica.
-                time.sleep(4)
+                time.sleep(pause)
+
+            except IngestaCancelada:
+                session.rollback()
+                resumen["cancelado"] = True
+                print(f"⏹️ Proceso cancelado tras {resumen['procesadas']} de {resumen['total']} filas")
+                break
 
             except Exception as e:
                 session.rollback() # Si hay un error en una fila, revertimos esa transacción
                 print(f"❌ Error procesando la fila {idx} ({row.get('Municipio', 'N/A')}, {row.get('Departamento', 'N/A')}): {e}")
+                reportar(f"Fila {idx} ({row.get('Municipio', 'N/A')}): {e}", confirmada=False)
 
     except Exception as e:
+        resumen["error"] = str(e)
         print(f"❌ Error general al procesar el archivo '{file_path}': {e}")
     finally:
         session.close() # Asegurarse de cerrar la sesión al finalizar
 
     print("🎉 ¡Proceso de extracción y guardado de datos GHI completado!")
+    return resumen
 
 
 # === EJECUCIÓN ===
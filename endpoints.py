@@ -1,44 +1,31 @@
-from fastapi import FastAPI, Query, HTTPException, Depends, Body
+from fastapi import FastAPI, Query, HTTPException, Depends, Body, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, Response
 from pydantic import BaseModel
-import requests
+from sqlalchemy import select, func
 from sqlalchemy.orm import Session, joinedload
-from database import SessionLocal
+from database import SessionLocal, AsyncSessionLocal, engine, async_engine
 from main import Gemini  # Asumimos que está bien definido
-from models import Department, Municipality, Location, LocationGHI
-import json
+from models import Base, Department, Municipality, Location, LocationGHI, BacktestScore
+from metrics import calculate_metrics
+from backtesting import leaderboard_municipio
+from ingestion import IngestQueue
+from sizing import MONTH_ORDER, CATALOGO_PANELES, validar_catalogo, perfil_mensual, reporte_dimensionamiento
+from tiles import TILE_VACIO, ruta_tile, regenerar_en_segundo_plano
+from name_index import NameIndex
+from nasa_client import nasa_api_client, NasaPowerError, CircuitOpenError
+from profiling import ProfilingConfig, instalar_profiling, leer_reporte
+import os
+import threading
+from collections import defaultdict
 
 
 from math import ceil
 
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Literal
 import numpy as np
 
-def calculate_metrics(y_true: List[float], y_pred: List[float]) -> Dict[str, float]:
-    """
-    Calcula métricas de evaluación entre valores reales y predichos.
-    """
-    y_true = np.array(y_true)
-    y_pred = np.array(y_pred)
-    
-    mae = np.mean(np.abs(y_true - y_pred))
-    rmse = np.sqrt(np.mean((y_true - y_pred) ** 2))
-    mape = np.mean(np.abs((y_true - y_pred) / y_true)) * 100  # en %
-    
-    # R² opcional
-    ss_res = np.sum((y_true - y_pred) ** 2)
-    ss_tot = np.sum((y_true - np.mean(y_true)) ** 2)
-    r2 = 1 - (ss_res / ss_tot) if ss_tot != 0 else 0.0
-
-    return {
-        "MAE": round(mae, 3),
-        "RMSE": round(rmse, 3),
-        "MAPE (%)": round(mape, 2),
-        "R2": round(r2, 3)
-    }
-
-
 def calcular_paneles(lat: float, lon: float, ghi_kwh: float, desired_kwh_day: float):
     """
     Calcula 5 opciones de cantidad de paneles según diferentes eficiencias.
@@ -86,15 +73,45 @@ class TextInput(BaseModel):
 class Enpoints:
     def __init__(self):
         self.app = FastAPI()
+        # Cerrar las conexiones aiosqlite (y sus hilos) al apagar la API
+        self.app.add_event_handler("shutdown", async_engine.dispose)
         self.app.add_middleware(
             CORSMiddleware,
             allow_origins=["*"],
             allow_methods=["*"],
             allow_headers=["*"],
         )
+        # Profiling por petición (opt-in, apagado salvo PROFILING_ENABLED en el .env)
+        self.profiling = ProfilingConfig()
+        instalar_profiling(self.app, self.profiling)
         self.gemini = Gemini()  # Inicializar una sola vez
+        Base.metadata.create_all(engine, tables=[BacktestScore.__table__])
+        # Caché de lecturas pesadas; se invalida cuando una ingesta guarda datos
+        self.cache = {}
+        self.cache_gen = 0
+        self._cache_lock = threading.Lock()
+        self.ingestion = IngestQueue()
+        self.ingestion.on_commit(self.invalidar_cache)
+        # Índice de nombres sin tildes/mayúsculas para resolver departamentos y municipios
+        self.names = NameIndex()
+        self.names.refresh()
+        self.ingestion.on_commit(self.names.refresh)
+        # Tiles de GHI: se generan en segundo plano (solo los años/meses que cambiaron)
+        self.ingestion.on_commit(regenerar_en_segundo_plano)
+        regenerar_en_segundo_plano()
         self.routes()
 
+    def invalidar_cache(self):
+        with self._cache_lock:
+            self.cache_gen += 1
+            self.cache = {}
+
+    def guardar_cache(self, key, gen: int, value):
+        """Guarda `value` solo si la caché no se invalidó desde que se leyó la BD (generación `gen`)."""
+        with self._cache_lock:
+            if gen == self.cache_gen:
+                self.cache[key] = value
+
     def get_db(self) -> Session:
         db = SessionLocal()
         try:
@@ -102,6 +119,30 @@ class Enpoints:
         finally:
             db.close()
 
+    def historial_municipio(self, municipality) -> List[Dict[str, Any]]:
+        """
+        Promedio mensual de GHI (todas las ubicaciones) de los años históricos,
+        ordenado cronológicamente. Requiere locations/ghi_values ya cargados.
+        """
+        month_order = [
+            "ENERO", "FEBRERO", "MARZO", "ABRIL", "MAYO", "JUNIO",
+            "JULIO", "AGOSTO", "SEPTIEMBRE", "OCTUBRE", "NOVIEMBRE", "DICIEMBRE"
+        ]
+        historical_years = [2019, 2020, 2021, 2022, 2023]
+
+        monthly_data = defaultdict(list)  # (mes, año) → [valores de todas las ubicaciones]
+        for loc in municipality.locations:
+            for ghi in loc.ghi_values:
+                if ghi.year in historical_years and ghi.month.upper() in month_order:
+                    monthly_data[(ghi.month.upper(), ghi.year)].append(ghi.value_kwh)
+
+        historial = [
+            {"month": month, "year": year_val, "value_kwh": round(sum(values) / len(values), 2)}
+            for (month, year_val), values in monthly_data.items()
+        ]
+        historial.sort(key=lambda x: (x["year"], month_order.index(x["month"])))
+        return historial
+
     def routes(self):
         @self.app.get("/")
         def index():
@@ -109,42 +150,48 @@ class Enpoints:
 
         # === /locations - Promedio anual calculado (sin depender de "ANUAL") ===
         @self.app.get("/locations")
-        def send_message(year: int = Query(..., description="Año para filtrar los valores GHI.")):
-            db = next(self.get_db())
-
-            locations = (
-                db.query(Location)
-                .options(
-                    joinedload(Location.municipality),
-                    joinedload(Location.ghi_values)
-                )
-                .all()
-            )
-
-            result = []
-            for loc in locations:
-                # Obtener todos los valores mensuales del año (excluyendo "ANUAL" si existe)
-                monthly_values = [
-                    ghi.value_kwh for ghi in loc.ghi_values
-                    if ghi.year == year and ghi.month.upper() != "ANUAL"
-                ]
-
-                if not monthly_values:
-                    continue
-
-                avg_kwh = sum(monthly_values) / len(monthly_values)
-
-                result.append({
-                    "municipality_name": loc.municipality.name,
-                    "latitude": loc.latitude,
-                    "longitude": loc.longitude,
+        async def send_message(year: int = Query(..., description="Año para filtrar los valores GHI.")):
+            cache_key = ("locations", year)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+            gen = self.cache_gen
+
+            # El promedio se calcula en SQLite: hidratar cada Location con sus
+            # ghi_values bloquearía el event loop durante el armado de objetos
+            async with AsyncSessionLocal() as db:
+                rows = (
+                    await db.execute(
+                        select(
+                            Municipality.name,
+                            Location.latitude,
+                            Location.longitude,
+                            func.avg(LocationGHI.value_kwh),
+                        )
+                        .join(Location.municipality)
+                        .join(Location.ghi_values)
+                        # Solo valores mensuales del año (excluyendo "ANUAL" si existe)
+                        .where(LocationGHI.year == year, func.upper(LocationGHI.month) != "ANUAL")
+                        .group_by(Location.id)
+                        .order_by(Location.id)
+                    )
+                ).all()
+
+            result = [
+                {
+                    "municipality_name": municipality_name,
+                    "latitude": latitude,
+                    "longitude": longitude,
                     "valor_anual_kwh": round(avg_kwh, 2),
                     "year": year
-                })
+                }
+                for municipality_name, latitude, longitude, avg_kwh in rows
+            ]
 
             if not result:
                 raise HTTPException(status_code=404, detail=f"No se encontraron datos para el año {year}")
 
+            self.guardar_cache(cache_key, gen, result)
             return result
 
         # === /departments/{name} - Estadísticas por departamento ===
@@ -153,12 +200,15 @@ class Enpoints:
             department_name: str,
             year: int = Query(..., description="Año para filtrar los valores GHI.")
         ):
+            department = self.names.departamento(department_name)
+            if not department:
+                raise HTTPException(status_code=404, detail=f"Departamento '{department_name}' no encontrado")
+
             db = next(self.get_db())
 
             municipalities = (
                 db.query(Municipality)
-                .join(Department)
-                .filter(Department.name == department_name)
+                .filter(Municipality.department_id == department["id"])
                 .options(
                     joinedload(Municipality.locations)
                     .joinedload(Location.ghi_values)
@@ -228,37 +278,47 @@ class Enpoints:
                 raise HTTPException(status_code=404, detail=f"No hay datos GHI para el año {year}")
 
             return {
-                "department": department_name,
+                "department": department["nombre"],
                 "year": year,
                 "municipalities": result
             }
 
         # === /departments - Lista de todos los departamentos ===
         @self.app.get("/departments")
-        def get_departments():
-            db = next(self.get_db())
-            departments = db.query(Department).all()
-            return [dept.name for dept in departments]
+        async def get_departments():
+            cached = self.cache.get("departments")
+            if cached is not None:
+                return cached
+            gen = self.cache_gen
+            async with AsyncSessionLocal() as db:
+                departments = (await db.scalars(select(Department))).all()
+            result = [dept.name for dept in departments]
+            self.guardar_cache("departments", gen, result)
+            return result
 
         # === /municipalities/{name}/range - Valores en un rango de meses ===
         @self.app.get("/municipalities/{municipality_name}/range")
-        def get_municipality_range(
+        async def get_municipality_range(
             municipality_name: str,
             start_month: str,
             end_month: str,
             year: int = Query(..., description="Año para filtrar los valores GHI.")
         ):
-            db = next(self.get_db())
+            encontrado = self.names.municipio(municipality_name)
+            if not encontrado:
+                raise HTTPException(status_code=404, detail=f"Municipio '{municipality_name}' no encontrado")
 
-            municipality = (
-                db.query(Municipality)
-                .filter(Municipality.name == municipality_name)
-                .options(
-                    joinedload(Municipality.locations)
-                    .joinedload(Location.ghi_values)
-                )
-                .first()
-            )
+            async with AsyncSessionLocal() as db:
+                municipality = (
+                    await db.scalars(
+                        select(Municipality)
+                        .filter(Municipality.id == encontrado["id"])
+                        .options(
+                            joinedload(Municipality.locations)
+                            .joinedload(Location.ghi_values)
+                        )
+                    )
+                ).unique().first()
 
             if not municipality:
                 raise HTTPException(status_code=404, detail=f"Municipio '{municipality_name}' no encontrado")
@@ -311,12 +371,19 @@ class Enpoints:
             end_month: str,
             year: int = Query(..., description="Año que se desea predecir (ej: 2025)")
         ):
+            encontrado = self.names.municipio(municipality_name)
+            if not encontrado:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Municipio '{municipality_name}' no encontrado"
+                )
+
             db = next(self.get_db())
 
             # === 1. Buscar el municipio con TODOS sus datos ===
             municipality = (
                 db.query(Municipality)
-                .filter(Municipality.name == municipality_name)
+                .filter(Municipality.id == encontrado["id"])
                 .options(
                     joinedload(Municipality.locations)
                     .joinedload(Location.ghi_values)
@@ -345,27 +412,10 @@ class Enpoints:
                     detail="Mes inválido. Usa: ENERO, FEBRERO, ..., DICIEMBRE"
                 )
 
-            # === 3. Años históricos disponibles en la BD ===
-            historical_years = [2019, 2020, 2021, 2022, 2023]
-
-            # === 4. Recolectar TODOS los valores mensuales (todos los meses, todos los años) ===
-            from collections import defaultdict
-            monthly_data = defaultdict(list)  # (mes, año) → [valores de todas las ubicaciones]
-
-            for loc in municipality.locations:
-                for ghi in loc.ghi_values:
-                    if ghi.year in historical_years and ghi.month.upper() != "ANUAL":
-                        monthly_data[(ghi.month, ghi.year)].append(ghi.value_kwh)
-
-            # Calcular promedio por mes/año (por si hay múltiples ubicaciones)
-            all_historical_values = []
-            for (month, year_val), values in monthly_data.items():
-                avg_kwh = sum(values) / len(values)
-                all_historical_values.append({
-                    "month": month,
-                    "year": year_val,
-                    "value_kwh": round(avg_kwh, 2)
-                })
+            # === 3. Historial mensual completo del municipio ===
+            all_historical_values = self.historial_municipio(municipality)
+            department_name = municipality.department.name
+            db.close()
 
             if not all_historical_values:
                 raise HTTPException(
@@ -373,11 +423,21 @@ class Enpoints:
                     detail="No hay datos históricos (2019-2024) para este municipio"
                 )
 
-            # === 5. Ordenar cronológicamente ===
-            all_historical_values.sort(key=lambda x: (x["year"], month_order.index(x["month"])))
-
-            # === 6. Enviar TODO el historial a la IA + meta de predicción ===
+            # === 4. Enviar el historial a la IA + meta de predicción ===
             data = {
+                "id": municipality.id,
+                "municipality": municipality.name,
+                "department": department_name,
+                "historical_data": all_historical_values
+            }
+
+            # === 5. Llamar a Gemini (respuesta JSON con esquema) ===
+            try:
+                prediction = self.gemini.send_message(anio=year, endmonth=end_month, startmonth=start_month, data=data)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Error en IA: {str(e)}")
+
+            return {
                 "municipality": municipality.name,
                 "target_prediction": {
                     "year": year,
@@ -385,33 +445,87 @@ class Enpoints:
                     "end_month": end_upper,
                     "range": f"{start_upper} - {end_upper}"
                 },
-                "historical_data": all_historical_values  # ✅ Todos los meses y años completos
+                **prediction
             }
 
-            # === 7. Llamar a Gemini con todo el contexto ===
+        # === /ia_prediction/batch - Predicción con IA de varios municipios por llamada ===
+        @self.app.post("/ia_prediction/batch")
+        def ia_data_batch(
+            start_month: str,
+            end_month: str,
+            year: int = Query(..., description="Año que se desea predecir (ej: 2025)"),
+            municipality_names: List[str] = Body(..., description="Nombres de los municipios a predecir")
+        ):
+            db = next(self.get_db())
+
+            month_order = [
+                "ENERO", "FEBRERO", "MARZO", "ABRIL", "MAYO", "JUNIO",
+                "JULIO", "AGOSTO", "SEPTIEMBRE", "OCTUBRE", "NOVIEMBRE", "DICIEMBRE"
+            ]
+            if start_month.upper() not in month_order or end_month.upper() not in month_order:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Mes inválido. Usa: ENERO, FEBRERO, ..., DICIEMBRE"
+                )
+
+            municipality_ids = [m["id"] for name in municipality_names for m in self.names.municipios(name)]
+            municipalities = (
+                db.query(Municipality)
+                .filter(Municipality.id.in_(municipality_ids))
+                .options(
+                    joinedload(Municipality.locations)
+                    .joinedload(Location.ghi_values)
+                )
+                .all()
+            )
+
+            data = []
+            for mun in municipalities:
+                historial = self.historial_municipio(mun)
+                if historial:
+                    data.append({
+                        "id": mun.id,
+                        "municipality": mun.name,
+                        "department": mun.department.name,
+                        "historical_data": historial
+                    })
+            db.close()
+
+            if not data:
+                raise HTTPException(status_code=404, detail="No hay datos históricos para los municipios solicitados")
+
             try:
-                prediction = self.gemini.send_message(anio=year, endmonth=end_month, startmonth=start_month, data=data)
+                predicciones = self.gemini.send_batch(data, start_month, end_month, year)
             except Exception as e:
                 raise HTTPException(status_code=500, detail=f"Error en IA: {str(e)}")
-            finally:
-                db.close()
-                print(f'"""{prediction.replace("json", " ").replace("```", " ").replace("```", " ")}"""')
-            return json.loads(f'{prediction.replace("json", " ").replace("```", " ").replace("```", " ")}')
+
+            # Una entrada por municipio (id): los nombres se repiten entre departamentos
+            return {
+                "year": year,
+                "range": f"{start_month.upper()} - {end_month.upper()}",
+                "predicciones": [
+                    {"municipality_id": m["id"], "municipality": m["municipality"], "department": m["department"], **predicciones[m["id"]]}
+                    for m in data if m["id"] in predicciones
+                ],
+                "sin_prediccion": [
+                    name for name in municipality_names
+                    if not any(m["id"] in predicciones for m in self.names.municipios(name))
+                ]
+            }
         
 
         @self.app.get("/municipios/{departamento}")
-        def get_municipios(departamento: str):
-            db = next(self.get_db())
-            # Buscar el departamento (case insensitive)
-            dept = db.query(Department).filter(Department.name.ilike(departamento)).first()
-            
+        async def get_municipios(departamento: str):
+            # Buscar el departamento (sin distinguir mayúsculas ni tildes)
+            dept = self.names.departamento(departamento)
             if not dept:
                 raise HTTPException(status_code=404, detail=f"El departamento '{departamento}' no existe")
 
-            municipios = db.query(Municipality).filter(Municipality.department_id == dept.id).all()
+            async with AsyncSessionLocal() as db:
+                municipios = (await db.scalars(select(Municipality).filter(Municipality.department_id == dept["id"]))).all()
 
             return {
-                "departamento": dept.name,
+                "departamento": dept["nombre"],
                 "municipios": [m.name for m in municipios]
             }
         
@@ -420,25 +534,64 @@ class Enpoints:
     lat: float = Query(None, description="Latitud (opcional si se da municipio)"),
     lon: float = Query(None, description="Longitud (opcional si se da municipio)"),
     energia_deseada: float = Query(..., description="Energía deseada en kWh/día")):
+            if lat is None or lon is None:
+                raise HTTPException(status_code=400, detail="Debes indicar lat y lon")
+
+            try:
+                ghi = nasa_api_client.monthly(lat, lon, 2023, 2024)
+            except CircuitOpenError as e:
+                raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(int(e.retry_after))})
+            except NasaPowerError as e:
+                raise HTTPException(status_code=502, detail=str(e))
+
+            # Promedio anual ("YYYY13") más reciente; si falta, promedio de los meses válidos (-999 = sin dato)
+            anuales = [ghi[k] for k in sorted(ghi, reverse=True) if k.endswith("13") and ghi[k] is not None and ghi[k] > 0]
+            mensuales = [v for k, v in ghi.items() if not k.endswith("13") and v is not None and v > 0]
+            if anuales:
+                ghi_kwh = anuales[0]
+            elif mensuales:
+                ghi_kwh = sum(mensuales) / len(mensuales)
+            else:
+                raise HTTPException(status_code=502, detail="NASA POWER no devolvió valores de GHI para esa ubicación")
+
+            return calcular_paneles(lon=lon, lat=lat, desired_kwh_day=energia_deseada, ghi_kwh=ghi_kwh)
+
+        # === /panels/sizing - Dimensionamiento mes a mes sobre un catálogo de paneles ===
+        @self.app.post("/panels/sizing")
+        def get_panels_sizing(
+            municipality_name: str = Query(..., description="Municipio cuyo perfil mensual de GHI se usa"),
+            energia_deseada: List[float] = Query(..., description="Uno o varios objetivos en kWh/día"),
+            vida_util: int = Query(25, ge=0, description="Años de vida útil para aplicar la degradación"),
+            top: int = Query(10, ge=1, description="Opciones más baratas a devolver por objetivo"),
+            catalogo: List[Dict[str, Any]] = Body(None, description="Catálogo propio: modelo, area_m2, eficiencia, costo, degradacion_anual")
+        ):
+            encontrado = self.names.municipio(municipality_name)
+            if not encontrado:
+                raise HTTPException(status_code=404, detail=f"Municipio '{municipality_name}' no encontrado")
+
             db = next(self.get_db())
+            municipality = db.get(Municipality, encontrado["id"])
 
-            url = (
-        f"https://power.larc.nasa.gov/api/temporal/monthly/point"
-        f"?latitude={lat}"
-        f"&longitude={lon}"
-        f"&start=2023"
-        f"&end=2024"
-        f"&community=RE"  # 'SB' para "Surface and Solar"
-        f"&parameters=ALLSKY_SFC_SW_DWN" # GHI: Irradiación Solar Horizontal de Cielo Completo en la Superficie
-        f"&format=json"
-    )
-            response = requests.get(url, timeout=30) # Aumentar timeout por si la API tarda
+            ghi_mensual = perfil_mensual(db, municipality.id)
+            if ghi_mensual is None:
+                raise HTTPException(status_code=404, detail=f"'{municipality_name}' no tiene GHI de los 12 meses")
 
-            print(response.json())
-            return calcular_paneles(lon=lon, lat=lat, desired_kwh_day=energia_deseada,ghi_kwh=response.json()["properties"]["parameter"]["ALLSKY_SFC_SW_DWN"]["202413"])
+            if catalogo is None:
+                catalogo = CATALOGO_PANELES
+            try:
+                validar_catalogo(catalogo)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            if any(e <= 0 for e in energia_deseada):
+                raise HTTPException(status_code=400, detail="La energía deseada debe ser mayor que 0")
 
+            return {
+                "municipio": municipality.name,
+                "ghi_mensual_kwh_m2_dia": {m: round(float(v), 3) for m, v in zip(MONTH_ORDER, ghi_mensual)},
+                "vida_util_anios": vida_util,
+                "resultados": reporte_dimensionamiento(catalogo, ghi_mensual, energia_deseada, top=top, vida_util_anios=vida_util)
+            }
 
-                
         @self.app.post("/evaluate_model")
         def evaluate_model(
             department_name: str = Query(None, description="Filtrar por departamento (opcional)"),
@@ -453,14 +606,16 @@ class Enpoints:
                 joinedload(Municipality.locations).joinedload(Location.ghi_values)
             )
 
+            dept = None
             if department_name:
-                dept = db.query(Department).filter(Department.name.ilike(department_name)).first()
+                dept = self.names.departamento(department_name)
                 if not dept:
                     raise HTTPException(status_code=404, detail=f"Departamento '{department_name}' no encontrado")
-                query = query.join(Department).filter(Department.id == dept.id)
+                query = query.filter(Municipality.department_id == dept["id"])
 
             if municipality_name:
-                query = query.filter(Municipality.name.ilike(municipality_name))
+                encontrados = self.names.municipios(municipality_name, dept["id"] if dept else None)
+                query = query.filter(Municipality.id.in_([m["id"] for m in encontrados]))
 
             municipalities = query.all()
 
@@ -528,4 +683,88 @@ class Enpoints:
                     "MAPE_promedio (%)": round(np.mean([r["metricas"]["MAPE (%)"] for r in report]), 2),
                 },
                 "detalle_por_municipio": report
-            }
\ No newline at end of file
+            }
+
+        # === /backtest/{name} - Leaderboard de métodos de pronóstico ===
+        @self.app.get("/backtest/{municipality_name}")
+        def get_backtest(
+            municipality_name: str,
+            horizon: int = Query(12, description="Horizonte (meses) con el que se corrió el backtest")
+        ):
+            encontrado = self.names.municipio(municipality_name)
+            if not encontrado:
+                raise HTTPException(status_code=404, detail=f"Municipio '{municipality_name}' no encontrado")
+
+            db = next(self.get_db())
+            municipality = db.get(Municipality, encontrado["id"])
+
+            leaderboard = leaderboard_municipio(db, municipality.id, horizon)
+            if not leaderboard:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"No hay backtest con horizonte {horizon} para '{municipality_name}'. Ejecuta backtesting.py"
+                )
+
+            return {
+                "municipio": municipality.name,
+                "departamento": municipality.department.name,
+                "horizonte_meses": horizon,
+                "leaderboard": leaderboard
+            }
+
+        # === /ingest - Ingesta de archivos en segundo plano ===
+        @self.app.post("/ingest", status_code=202)
+        def ingest_file(file: UploadFile = File(..., description="CSV/Excel con Municipio, Departamento, Latitud, Longitud")):
+            job = self.ingestion.submit(file.filename, file.file)
+            return job.to_dict()
+
+        @self.app.get("/ingest")
+        def list_ingest_jobs():
+            return [job.to_dict() for job in self.ingestion.list()]
+
+        @self.app.get("/ingest/{job_id}")
+        def get_ingest_job(job_id: str):
+            job = self.ingestion.get(job_id)
+            if not job:
+                raise HTTPException(status_code=404, detail=f"Trabajo de ingesta '{job_id}' no encontrado")
+            return job.to_dict()
+
+        @self.app.delete("/ingest/{job_id}")
+        def cancel_ingest_job(job_id: str):
+            job = self.ingestion.cancel(job_id)
+            if not job:
+                raise HTTPException(status_code=404, detail=f"Trabajo de ingesta '{job_id}' no encontrado")
+            return job.to_dict()
+
+        # === /tiles - Tiles PNG de GHI interpolado (lectura pura de caché) ===
+        @self.app.get("/tiles/{year}/{month}/{z}/{x}/{y}.png")
+        def get_tile(year: int, month: str, z: int, x: int, y: int):
+            month_upper = month.upper()
+            if month_upper not in MONTH_ORDER:
+                raise HTTPException(status_code=400, detail="Mes inválido. Usa: ENERO, FEBRERO, ..., DICIEMBRE")
+
+            headers = {"Cache-Control": "public, max-age=3600"}
+            path = ruta_tile(year, month_upper, z, x, y)
+            if not os.path.exists(path):
+                # Fuera de la zona con datos (o aún no generado): tile transparente
+                return Response(content=TILE_VACIO, media_type="image/png", headers=headers)
+            return FileResponse(path, media_type="image/png", headers=headers)
+
+        # === /autocomplete - Sugerencias de departamentos y municipios ===
+        @self.app.get("/autocomplete")
+        async def autocomplete(
+            q: str = Query(..., min_length=1, description="Prefijo a buscar (sin importar tildes ni mayúsculas)"),
+            limit: int = Query(10, ge=1, le=20, description="Máximo de sugerencias"),
+            tipo: Literal["departamento", "municipio"] = Query(None, description="Filtrar por 'departamento' o 'municipio'")
+        ):
+            return self.names.autocomplete(q, limite=limit, tipo=tipo)
+
+        # === /profiles/{id} - Reporte de profiling de una petición ===
+        @self.app.get("/profiles/{profile_id}")
+        def get_profile(profile_id: str):
+            if not self.profiling.enabled:
+                raise HTTPException(status_code=404, detail="El profiling está deshabilitado (PROFILING_ENABLED)")
+            reporte = leer_reporte(self.profiling, profile_id)
+            if not reporte:
+                raise HTTPException(status_code=404, detail=f"Reporte de profiling '{profile_id}' no encontrado")
+            return reporte
@@ -0,0 +1,168 @@
+import os
+import time
+import uuid
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from dataset import process_file
+
+# === ESTADOS DE UN TRABAJO DE INGESTA ===
+EN_COLA = "en_cola"
+PROCESANDO = "procesando"
+COMPLETADO = "completado"
+CANCELADO = "cancelado"
+ERROR = "error"
+
+
+class IngestJob:
+    def __init__(self, filename: str, path: str):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.path = path
+        self.status = EN_COLA
+        self.total = 0
+        self.procesadas = 0
+        self.guardadas = 0
+        self.errores = []
+        self.creado = time.time()
+        self.inicio = None
+        self.fin = None
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelado(self) -> bool:
+        return self._cancel.is_set()
+
+    def progreso(self, procesadas, total, error, confirmada=True):
+        self.procesadas = procesadas
+        self.total = total
+        if error is None:
+            self.guardadas += 1
+        else:
+            self.errores.append(error)
+
+    def to_dict(self):
+        ahora = self.fin or time.time()
+        transcurrido = (ahora - self.inicio) if self.inicio else 0.0
+        filas_por_seg = self.procesadas / transcurrido if transcurrido > 0 else 0.0
+        pendientes = max(self.total - self.procesadas, 0)
+        eta = pendientes / filas_por_seg if filas_por_seg > 0 and self.status == PROCESANDO else None
+
+        return {
+            "job_id": self.id,
+            "archivo": self.filename,
+            "estado": self.status,
+            "total_filas": self.total,
+            "filas_procesadas": self.procesadas,
+            "filas_guardadas": self.guardadas,
+            "filas_por_segundo": round(filas_por_seg, 3),
+            "eta_segundos": round(eta, 1) if eta is not None else None,
+            "segundos_transcurridos": round(transcurrido, 1),
+            "errores": self.errores,
+        }
+
+
+class IngestQueue:
+    """
+    Cola de ingesta en segundo plano: cada archivo subido se procesa con
+    `process_file` en un pool de hilos, sin bloquear a la API.
+
+    Por defecto hay un solo worker: SQLite admite un escritor a la vez y la
+    API de NASA POWER limita las solicitudes por IP.
+
+    Mientras un trabajo confirma filas se avisa a los listeners de `on_commit`
+    como mucho cada `notify_interval` segundos, y una vez más al terminar.
+    """
+
+    def __init__(self, max_workers: int = 1, upload_dir: str = "uploads", pause: float = 4,
+                 notify_interval: float = 30):
+        self.upload_dir = upload_dir
+        self.pause = pause
+        self.notify_interval = notify_interval
+        self.jobs = {}
+        self._listeners = []
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingesta")
+        os.makedirs(upload_dir, exist_ok=True)
+
+    def on_commit(self, callback):
+        """Registra una función sin argumentos que se llama cuando un trabajo confirma filas en la BD."""
+        self._listeners.append(callback)
+
+    def submit(self, filename: str, fileobj) -> IngestJob:
+        nombre = os.path.basename(filename or "archivo.csv")
+        path = os.path.join(self.upload_dir, f"{uuid.uuid4().hex}_{nombre}")
+        with open(path, "wb") as destino:
+            shutil.copyfileobj(fileobj, destino)
+
+        job = IngestJob(nombre, path)
+        self.jobs[job.id] = job
+        self._pool.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    def list(self):
+        return sorted(self.jobs.values(), key=lambda j: j.creado, reverse=True)
+
+    def cancel(self, job_id: str):
+        job = self.jobs.get(job_id)
+        if job and job.status in (EN_COLA, PROCESANDO):
+            job.cancel()
+        return job
+
+    def _run(self, job: IngestJob):
+        if job.cancelado:
+            job.status = CANCELADO
+            job.fin = time.time()
+            return
+
+        job.status = PROCESANDO
+        job.inicio = time.time()
+        resumen = None
+        # Filas confirmadas que los listeners todavía no vieron
+        aviso = {"pendiente": False, "ultimo": time.monotonic()}
+
+        def progreso(procesadas, total, error, confirmada):
+            job.progreso(procesadas, total, error, confirmada)
+            if confirmada:
+                aviso["pendiente"] = True
+            if aviso["pendiente"] and time.monotonic() - aviso["ultimo"] >= self.notify_interval:
+                self._notify()
+                aviso["pendiente"], aviso["ultimo"] = False, time.monotonic()
+
+        try:
+            resumen = process_file(
+                job.path,
+                on_progress=progreso,
+                should_cancel=lambda: job.cancelado,
+                pause=self.pause,
+            )
+            if resumen["error"]:
+                job.errores.append(resumen["error"])
+                job.status = ERROR
+            else:
+                job.status = CANCELADO if resumen["cancelado"] else COMPLETADO
+        except Exception as e:
+            job.errores.append(str(e))
+            job.status = ERROR
+        finally:
+            job.fin = time.time()
+            # Cualquier fila con commit (aunque sin GHI) puede traer departamentos/municipios nuevos
+            if resumen is None or aviso["pendiente"]:
+                self._notify()
+            try:
+                os.remove(job.path)
+            except OSError:
+                pass
+
+    def _notify(self):
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ Error refrescando cachés tras la ingesta: {e}")
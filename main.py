@@ -3,50 +3,76 @@ from dotenv import load_dotenv
 import os
 import uvicorn
 import pandas as pd
+from name_index import normalizar
+from prompts import (
+    MAX_PROMPT_TOKENS, estimar_tokens, clave_municipio, esquema_lote,
+    codificar_historial, construir_prompt, agrupar_por_presupuesto, parsear_respuesta,
+)
 
 class Gemini():
-    def __init__(self):
-        load_dotenv()
-        self.secret_key = os.getenv("GEMINIS_API_KEY")
-        geminis.configure(api_key=self.secret_key)
-        self.model = geminis.GenerativeModel("gemini-1.5-flash")
+    def __init__(self, model=None, max_prompt_tokens=MAX_PROMPT_TOKENS):
+        # `model` permite inyectar un modelo local (stub) con la misma interfaz
+        # generate_content(prompt, generation_config=...) -> objeto con .text
+        if model is None:
+            load_dotenv()
+            self.secret_key = os.getenv("GEMINIS_API_KEY")
+            geminis.configure(api_key=self.secret_key)
+            model = geminis.GenerativeModel("gemini-1.5-flash")
+        self.model = model
+        self.max_prompt_tokens = max_prompt_tokens
 
+    def send_batch(self, municipios, startmonth, endmonth, anio):
+        """
+        Predice varios municipios con el menor número de llamadas posible.
 
-    def send_message(self, data, startmonth, endmonth, anio):
-        prompt = f"""
-Rol: Eres un profesional experto en proyectos de energía renovable y tienes amplios conocimientos en predicción temporales
-
-Task: 
-necesito que generes una predicción precisa de los valores de GHI para el año **{anio}, específicamente en el rango de meses comprendido entre *{startmonth} y {endmonth}*.
-
-Formato de salida:
-Tu predicción debe cumplir con los siguientes criterios:
+        `municipios` es una lista de {"id", "municipality", "department", "historical_data"};
+        se devuelve {id: predicción} con las entradas de "predicciones". En el prompt
+        cada municipio se identifica como "Nombre (Departamento)" porque los
+        nombres se repiten entre departamentos.
 
-1. Objetivo principal: Predecir los valores promedio mensuales de GHI (en kWh/m²/día) para cada mes en el rango especificado de {anio}.
-2. Entrada: Utiliza los valores históricos del año 2023 contenidos en el JSON {data['historical_data']} como única fuente de entrenamiento.
-3. Formato de salida: La predicción debe devolverse exclusivamente en el mismo formato del objeto {data['historical_data']}, eliminando el historico y generando la prediccion correspondientes al año {anio} **solo para los meses solicitados.
-4. Campo adicional obligatorio: Agrega un campo al JSON llamado "metadatos_prediccion" que incluya:
-   - "metodo_usado": el nombre del modelo estadístico aplicado (ej. "Prophet", "SARIMA", "Holt-Winters").
-   - "margen_error_estimado": error estimado (RMSE, MAE o MAPE, según el modelo).
-   - "unidad": especifica "kWh/m²/día".
-   - Metrica d eprecicion del modelo en %
+        El esquema de cada lote restringe "municipio" a las claves del lote y la
+        respuesta se empareja sin distinguir mayúsculas ni tildes.
+        """
+        startmonth, endmonth = startmonth.upper(), endmonth.upper()
+        # Tokens disponibles para los históricos una vez descontadas las instrucciones fijas
+        disponibles = max(self.max_prompt_tokens - estimar_tokens(construir_prompt([], anio, startmonth, endmonth)), 1)
 
-5. Modelos recomendados: Evalúa e implementa al menos uno de los siguientes enfoques:
-   - Modelos clásicos de series temporales como Holt-Winters.
- 
-Recompensa:
-Si realizas correctamente la tarea, te consideraremos un experto / genio en energías renovables y te otorgaremos una bonificación
+        por_clave = {}
+        codificados = []
+        for m in municipios:
+            clave = clave_municipio(m["municipality"], m.get("department"))
+            if normalizar(clave) in por_clave:
+                clave = f"{clave} #{m['id']}"
+            por_clave[normalizar(clave)] = m.get("id", clave)
+            codificados.append({
+                "municipality": clave,
+                "historial": codificar_historial(
+                    m["historical_data"], max_tokens=max(disponibles - estimar_tokens(clave) - 2, 1)
+                ),
+            })
 
-Refuerzo:
-La respuesta debe consistir exclusivamente en un JSON válido con los valores de GHI predichos para el rango solicitado de 2025, más los metadatos mencionados
+        predicciones = {}
+        for lote in agrupar_por_presupuesto(codificados, disponibles):
+            prompt = construir_prompt(lote, anio, startmonth, endmonth)
+            # Modo JSON con esquema: el modelo solo puede responder con las claves del lote
+            generation_config = {
+                "response_mime_type": "application/json",
+                "response_schema": esquema_lote(m["municipality"] for m in lote),
+            }
+            response = self.model.generate_content(prompt, generation_config=generation_config)
+            for prediccion in parsear_respuesta(response.text).get("predicciones", []):
+                clave = normalizar(str(prediccion.get("municipio", "")))
+                if clave in por_clave:
+                    predicciones[por_clave[clave]] = prediccion
 
-Nuevamente recuerda y ten presente que no debes devolverme el mismo json que te estamos entregando, sino, que tienes que realizar la respectiva predicción real aplicando el metodo Hunt winters
+        return predicciones
 
-Te recuerdo que no puedes responder con mas que con el json, no respondas con texto adicional solo con json porfavor
-"""
-
-        response = self.model.generate_content(prompt)
-        return response.text
+    def send_message(self, data, startmonth, endmonth, anio):
+        predicciones = self.send_batch([data], startmonth, endmonth, anio)
+        clave = data.get("id", clave_municipio(data["municipality"], data.get("department")))
+        if clave not in predicciones:
+            raise ValueError(f"La IA no devolvió predicción para '{data['municipality']}'")
+        return predicciones[clave]
 
 
 
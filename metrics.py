@@ -0,0 +1,25 @@
+from typing import List, Dict
+import numpy as np
+
+def calculate_metrics(y_true: List[float], y_pred: List[float]) -> Dict[str, float]:
+    """
+    Calcula métricas de evaluación entre valores reales y predichos.
+    """
+    y_true = np.array(y_true)
+    y_pred = np.array(y_pred)
+    
+    mae = np.mean(np.abs(y_true - y_pred))
+    rmse = np.sqrt(np.mean((y_true - y_pred) ** 2))
+    mape = np.mean(np.abs((y_true - y_pred) / y_true)) * 100  # en %
+    
+    # R² opcional
+    ss_res = np.sum((y_true - y_pred) ** 2)
+    ss_tot = np.sum((y_true - np.mean(y_true)) ** 2)
+    r2 = 1 - (ss_res / ss_tot) if ss_tot != 0 else 0.0
+
+    return {
+        "MAE": round(mae, 3),
+        "RMSE": round(rmse, 3),
+        "MAPE (%)": round(mape, 2),
+        "R2": round(r2, 3)
+    }
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, UniqueConstraint
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
@@ -40,3 +42,19 @@ class LocationGHI(Base):
     location = relationship("Location", back_populates="ghi_values")
     __table_args__ = (UniqueConstraint('location_id', 'month', 'year', name='uix_location_month_year'),)
 
+
+class BacktestScore(Base):
+    __tablename__ = "backtest_scores"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    municipality_id = Column(Integer, ForeignKey("municipalities.id"), nullable=False)
+    method = Column(String, nullable=False)   # naive, seasonal_naive, holt_winters, ...
+    horizon = Column(Integer, nullable=False) # meses pronosticados por origen
+    folds = Column(Integer, nullable=False)   # cantidad de orígenes evaluados
+    mae = Column(Float, nullable=False)
+    rmse = Column(Float, nullable=False)
+    mape = Column(Float, nullable=False)
+    r2 = Column(Float, nullable=False)
+    rank = Column(Integer, nullable=False)    # 1 = mejor método (menor RMSE)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    municipality = relationship("Municipality")
+    __table_args__ = (UniqueConstraint('municipality_id', 'method', 'horizon', name='uix_backtest_mun_method_horizon'),)
@@ -0,0 +1,119 @@
+import re
+import threading
+import unicodedata
+
+from database import SessionLocal
+from models import Department, Municipality
+
+MAX_SUGERENCIAS = 20  # sugerencias guardadas por nodo del trie (en total y por tipo)
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sin tildes y con espacios simples: "  Bogotá D.C." → "bogota d.c."."""
+    sin_tildes = "".join(
+        c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c)
+    )
+    return re.sub(r"\s+", " ", sin_tildes.casefold()).strip()
+
+
+class NameIndex:
+    """
+    Índice en memoria de departamentos y municipios por nombre normalizado
+    (sin mayúsculas ni tildes) con un trie de prefijos para autocompletar.
+
+    `refresh()` reconstruye todo desde la BD y reemplaza las estructuras de una
+    sola vez, así las lecturas concurrentes nunca ven un índice a medias.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._departamentos = {}  # nombre normalizado → {"id", "nombre"}
+        self._municipios = {}     # nombre normalizado → [{"id", "nombre", "departamento_id", "departamento"}]
+        self._trie = {}
+
+    def refresh(self):
+        session = SessionLocal()
+        try:
+            departamentos = session.query(Department.id, Department.name).all()
+            municipios = (
+                session.query(Municipality.id, Municipality.name, Department.id, Department.name)
+                .join(Department, Municipality.department_id == Department.id)
+                .all()
+            )
+        finally:
+            session.close()
+
+        por_departamento = {}
+        sugerencias = []
+        for dep_id, nombre in departamentos:
+            entrada = {"tipo": "departamento", "id": dep_id, "nombre": nombre}
+            por_departamento[normalizar(nombre)] = entrada
+            sugerencias.append(entrada)
+
+        por_municipio = {}
+        for mun_id, nombre, dep_id, dep_nombre in municipios:
+            entrada = {
+                "tipo": "municipio", "id": mun_id, "nombre": nombre,
+                "departamento_id": dep_id, "departamento": dep_nombre,
+            }
+            por_municipio.setdefault(normalizar(nombre), []).append(entrada)
+            sugerencias.append(entrada)
+
+        trie = self._construir_trie(sugerencias)
+        with self._lock:
+            self._departamentos, self._municipios, self._trie = por_departamento, por_municipio, trie
+
+    @staticmethod
+    def _construir_trie(entradas):
+        # Cada nombre se indexa desde el inicio de cada palabra ("san andres" → "san andres", "andres").
+        # nodo["$"] guarda las sugerencias por tipo (None = todas), cada lista recortada por separado
+        # para que filtrar por tipo no se quede sin resultados tras el recorte.
+        trie = {}
+        for entrada in entradas:
+            clave = normalizar(entrada["nombre"])
+            inicios = [0] + [m.end() for m in re.finditer(r"[ \-]", clave)]
+            visitados = set()
+            for inicio in inicios:
+                nodo = trie
+                for caracter in clave[inicio:]:
+                    nodo = nodo.setdefault(caracter, {"$": {}})
+                    if id(nodo) not in visitados:
+                        visitados.add(id(nodo))
+                        nodo["$"].setdefault(None, []).append(entrada)
+                        nodo["$"].setdefault(entrada["tipo"], []).append(entrada)
+
+        # Dejar en cada nodo solo las mejores sugerencias (nombres más cortos primero)
+        pendientes = [trie]
+        while pendientes:
+            nodo = pendientes.pop()
+            for caracter, hijo in nodo.items():
+                if caracter == "$":
+                    continue
+                for lista in hijo["$"].values():
+                    lista.sort(key=lambda e: (len(e["nombre"]), normalizar(e["nombre"])))
+                    del lista[MAX_SUGERENCIAS:]
+                pendientes.append(hijo)
+        return trie
+
+    def departamento(self, nombre: str):
+        return self._departamentos.get(normalizar(nombre))
+
+    def municipios(self, nombre: str, departamento_id: int = None):
+        encontrados = self._municipios.get(normalizar(nombre), [])
+        if departamento_id is not None:
+            encontrados = [m for m in encontrados if m["departamento_id"] == departamento_id]
+        return encontrados
+
+    def municipio(self, nombre: str, departamento_id: int = None):
+        encontrados = self.municipios(nombre, departamento_id)
+        return encontrados[0] if encontrados else None
+
+    def autocomplete(self, prefijo: str, limite: int = 10, tipo: str = None):
+        nodo = self._trie
+        for caracter in normalizar(prefijo):
+            nodo = nodo.get(caracter)
+            if nodo is None:
+                return []
+
+        sugerencias = nodo.get("$", {}).get(tipo or None, [])
+        return sugerencias[:limite]
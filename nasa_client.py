@@ -0,0 +1,175 @@
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+NASA_POWER_URL = "https://power.larc.nasa.gov/api/temporal/monthly/point"
+GHI_PARAMETER = "ALLSKY_SFC_SW_DWN"  # GHI: Irradiación Solar Horizontal de Cielo Completo en la Superficie
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class NasaPowerError(Exception):
+    """La API de NASA POWER no devolvió datos utilizables."""
+
+
+class CircuitOpenError(NasaPowerError):
+    """El circuito está abierto: NASA POWER falló hace poco y no se reintenta todavía."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"NASA POWER no disponible, reintenta en {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Cerrado: deja pasar todo. Tras `max_fallas` fallas seguidas se abre y
+    rechaza las llamadas durante `reset_timeout` segundos; luego deja pasar
+    una sola llamada de prueba (semiabierto) que lo cierra o lo vuelve a abrir.
+    `abrir(segundos)` lo abre directamente, p. ej. con el Retry-After del servidor.
+    """
+
+    def __init__(self, max_fallas: int = 5, reset_timeout: float = 60):
+        self.max_fallas = max_fallas
+        self.reset_timeout = reset_timeout
+        self._fallas = 0
+        self._abierto_hasta = None
+        self._probando = False
+        self._lock = threading.Lock()
+
+    def antes_de_llamar(self):
+        with self._lock:
+            if self._abierto_hasta is None:
+                return
+            restante = self._abierto_hasta - time.monotonic()
+            if restante > 0 or self._probando:
+                raise CircuitOpenError(max(restante, 1))
+            self._probando = True
+
+    def exito(self):
+        with self._lock:
+            self._fallas = 0
+            self._abierto_hasta = None
+            self._probando = False
+
+    def falla(self):
+        with self._lock:
+            self._fallas += 1
+            if self._probando or self._fallas >= self.max_fallas:
+                self._abierto_hasta = time.monotonic() + self.reset_timeout
+            self._probando = False
+
+    def abrir(self, segundos: float):
+        with self._lock:
+            hasta = time.monotonic() + segundos
+            self._abierto_hasta = max(hasta, self._abierto_hasta or hasta)
+            self._probando = False
+
+
+class NasaPowerClient:
+    """
+    Cliente compartido de NASA POWER: reutiliza conexiones keep-alive,
+    reintenta errores transitorios con backoff exponencial con jitter
+    (respetando Retry-After) y corta con un circuit breaker si la API cae.
+    Si el servidor pide esperar más que `backoff_max`, no se reintenta antes:
+    se abre el breaker hasta entonces y se lanza CircuitOpenError.
+    """
+
+    def __init__(self, max_retries: int = 3, backoff_base: float = 1.0, backoff_max: float = 30.0,
+                 timeout: float = 30.0, pool_size: int = 10, breaker: CircuitBreaker = None):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+
+    def _backoff(self, intento: int) -> float:
+        # "Full jitter": espera aleatoria entre 0 y el tope exponencial
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** intento))
+
+    def _retry_after(self, response) -> float:
+        valor = response.headers.get("Retry-After")
+        if not valor:
+            return None
+        try:
+            segundos = float(valor)
+        except ValueError:
+            try:
+                segundos = parsedate_to_datetime(valor).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+        return max(segundos, 0)
+
+    def _get(self, params) -> dict:
+        self.breaker.antes_de_llamar()
+
+        # Toda salida informa al breaker (exito o falla); si no, una llamada de
+        # prueba sin informar lo dejaría abierto para siempre
+        informado = False
+        try:
+            error = None
+            for intento in range(self.max_retries + 1):
+                try:
+                    response = self.session.get(NASA_POWER_URL, params=params, timeout=self.timeout)
+                    if response.status_code == 200:
+                        data = response.json()
+                        self.breaker.exito()
+                        informado = True
+                        return data
+                except requests.exceptions.RequestException as e:
+                    # Conexión, timeout, respuesta cortada, JSON inválido...: transitorio
+                    error = f"Error de conexión con NASA POWER: {e}"
+                    espera = self._backoff(intento)
+                else:
+                    if response.status_code not in RETRYABLE_STATUS:
+                        # Error del cliente (parámetros): la API está arriba, no cuenta como falla
+                        self.breaker.exito()
+                        informado = True
+                        raise NasaPowerError(f"NASA POWER respondió {response.status_code}: {response.text[:200]}")
+                    error = f"NASA POWER respondió {response.status_code}"
+                    espera = self._retry_after(response)
+                    if espera is None:
+                        espera = self._backoff(intento)
+                    elif espera > self.backoff_max:
+                        # Reintentar antes de lo que pide el servidor solo alimenta la tormenta
+                        self.breaker.abrir(espera)
+                        informado = True
+                        raise CircuitOpenError(espera)
+
+                if intento < self.max_retries:
+                    time.sleep(espera)
+
+            raise NasaPowerError(f"{error} (tras {self.max_retries + 1} intentos)")
+        finally:
+            if not informado:
+                self.breaker.falla()
+
+    def monthly(self, lat: float, lon: float, start_year: int, end_year: int, parameter: str = GHI_PARAMETER) -> dict:
+        """Valores mensuales {"YYYYMM": valor} del parámetro; "YYYY13" es el promedio anual."""
+        data = self._get({
+            "latitude": round(lat, 3),
+            "longitude": round(lon, 3),
+            "start": start_year,
+            "end": end_year,
+            "community": "RE",
+            "parameters": parameter,
+            "format": "json",
+        })
+        try:
+            return data["properties"]["parameter"][parameter]
+        except (KeyError, TypeError):
+            raise NasaPowerError(f"La respuesta de NASA POWER no contiene {parameter}")
+
+
+# Instancia para la ingesta (en segundo plano: puede esperar y reintentar)
+nasa_client = NasaPowerClient()
+
+# Instancia para los endpoints: timeout corto y un solo reintento para no retener un
+# hilo del threadpool por minutos. Comparte el breaker: la salud de la API es la misma.
+nasa_api_client = NasaPowerClient(max_retries=1, backoff_max=5.0, timeout=10.0, breaker=nasa_client.breaker)
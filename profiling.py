@@ -0,0 +1,266 @@
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import threading
+import functools
+import contextvars
+from collections import Counter
+
+import fastapi.routing
+import fastapi.dependencies.utils
+from dotenv import load_dotenv
+from sqlalchemy import event
+from starlette.concurrency import run_in_threadpool
+
+from database import engine, async_engine
+
+# Funciones "en espera" que no interesan en el perfil (event loop esperando I/O)
+_ARCHIVOS_OCIOSOS = ("threading.py", "selectors.py", "queue.py")
+
+# Captura activa de la petición en curso (se propaga al threadpool y a las tareas async)
+_captura_actual = contextvars.ContextVar("captura_profiling", default=None)
+
+
+class ProfilingConfig:
+    """
+    Configuración leída del entorno (.env):
+      PROFILING_ENABLED      "1"/"true" para habilitar el modo (por defecto apagado)
+      PROFILING_SAMPLE_RATE  fracción del tráfico que se captura sin pedirlo (0-1)
+      PROFILING_DIR          directorio donde se guardan los reportes
+      PROFILING_INTERVAL_MS  intervalo del profiler por muestreo
+    """
+
+    def __init__(self):
+        load_dotenv()
+        self.enabled = os.getenv("PROFILING_ENABLED", "0").lower() in ("1", "true", "yes")
+        self.sample_rate = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+        self.directory = os.getenv("PROFILING_DIR", "profiles")
+        self.interval = float(os.getenv("PROFILING_INTERVAL_MS", "5")) / 1000
+
+
+class Captura:
+    """SQL ejecutado y muestras de pila de los hilos que atienden una petición."""
+
+    def __init__(self, interval: float):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.interval = interval
+        self.sql = []
+        self.muestras = Counter()
+        self.total_muestras = 0
+        self.hilo_loop = None  # event loop: compartido por todas las peticiones async
+        self.hilos = set()     # hilos del threadpool que ejecutan esta petición
+        self.descartadas = 0   # muestras del event loop que no se pudieron atribuir
+
+    def tomar_muestra(self, frames, loop_compartido: bool = False):
+        # Si otra petición capturada corre en el mismo event loop, su pila no se
+        # distingue de la nuestra: esas muestras se descartan en vez de mezclarse
+        hilos = set(self.hilos)
+        if self.hilo_loop is not None:
+            if loop_compartido:
+                self.descartadas += 1
+            else:
+                hilos.add(self.hilo_loop)
+        for ident in hilos:
+            frame = frames.get(ident)
+            if frame is None or frame.f_code.co_name == "_muestrear":
+                continue
+            if frame.f_code.co_filename.endswith(_ARCHIVOS_OCIOSOS):
+                continue
+            pila = []
+            while frame is not None:
+                codigo = frame.f_code
+                pila.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            self.muestras[";".join(reversed(pila))] += 1
+            self.total_muestras += 1
+
+    def reporte(self, request, status_code: int, duracion: float, motivo: str):
+        return {
+            "id": self.id,
+            "motivo": motivo,
+            "metodo": request.method,
+            "ruta": request.url.path,
+            "query": str(request.url.query),
+            "status": status_code,
+            "duracion_ms": round(duracion * 1000, 2),
+            "sql_total_ms": round(sum(q["duracion_ms"] for q in self.sql), 2),
+            "sql": self.sql,
+            "perfil": {
+                "intervalo_ms": self.interval * 1000,
+                "muestras": self.total_muestras,
+                # Muestras del event loop omitidas por haber otras capturas activas a la vez.
+                # Las peticiones async que no capturamos también corren en ese hilo y no se
+                # pueden separar: el perfil del event loop es aproximado con tráfico concurrente.
+                "muestras_loop_descartadas": self.descartadas,
+                # Formato "folded" (pila;separada;por;puntos y comas) compatible con flamegraph
+                "pilas": [{"pila": pila, "muestras": n} for pila, n in self.muestras.most_common(50)],
+            },
+        }
+
+
+class Muestreador:
+    """
+    Un único hilo de muestreo para todas las capturas activas: en cada tick lee
+    `sys._current_frames()` una vez y le pasa a cada captura solo las pilas de
+    sus propios hilos. Sin capturas activas el hilo queda dormido.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._capturas = set()
+        self._lock = threading.Lock()
+        self._hay_capturas = threading.Event()
+        self._hilo = None
+
+    def agregar(self, captura: Captura):
+        with self._lock:
+            self._capturas.add(captura)
+            self._hay_capturas.set()
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._muestrear, daemon=True, name="profiling")
+                self._hilo.start()
+
+    def quitar(self, captura: Captura):
+        # Tomado el lock, el hilo de muestreo ya no escribe en esta captura
+        with self._lock:
+            self._capturas.discard(captura)
+            if not self._capturas:
+                self._hay_capturas.clear()
+
+    def _muestrear(self):
+        while True:
+            self._hay_capturas.wait()
+            with self._lock:
+                frames = sys._current_frames()
+                por_loop = Counter(c.hilo_loop for c in self._capturas)
+                for captura in self._capturas:
+                    captura.tomar_muestra(frames, loop_compartido=por_loop[captura.hilo_loop] > 1)
+            time.sleep(self.interval)
+
+
+# === HILOS DEL THREADPOOL ===
+def _en_hilo_de_captura(func):
+    """Envuelve `func` para que, al correr en el threadpool, registre su hilo en la captura activa."""
+    captura = _captura_actual.get()
+    if captura is None:
+        return func
+
+    @functools.wraps(func)
+    def envoltura(*args, **kwargs):
+        hilo = threading.get_ident()
+        captura.hilos.add(hilo)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            captura.hilos.discard(hilo)
+
+    return envoltura
+
+
+def _envolver_threadpool(original):
+    async def run_in_threadpool(func, *args, **kwargs):
+        return await original(_en_hilo_de_captura(func), *args, **kwargs)
+
+    run_in_threadpool._profiling = True
+    return run_in_threadpool
+
+
+def _instalar_threadpool():
+    # FastAPI ejecuta los endpoints y dependencias síncronos con `run_in_threadpool`
+    # (importado en routing y dependencies.utils); se envuelve para saber qué hilo
+    # del pool atiende cada petición capturada. Son rutas internas de FastAPI: si
+    # cambian, se avisa y el perfil queda limitado al event loop.
+    for modulo in (fastapi.routing, fastapi.dependencies.utils):
+        original = getattr(modulo, "run_in_threadpool", None)
+        if original is None:
+            print(f"⚠️ Profiling: {modulo.__name__}.run_in_threadpool no existe; "
+                  "los hilos del threadpool que lanza ese módulo no se perfilarán")
+            continue
+        if not getattr(original, "_profiling", False):
+            modulo.run_in_threadpool = _envolver_threadpool(original)
+
+
+# === TRAZA DE SQL ===
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    if _captura_actual.get() is not None:
+        conn.info.setdefault("profiling_inicio", []).append(time.perf_counter())
+
+
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    captura = _captura_actual.get()
+    if captura is None or not conn.info.get("profiling_inicio"):
+        return
+    duracion = time.perf_counter() - conn.info["profiling_inicio"].pop()
+    captura.sql.append({
+        "statement": statement,
+        "parametros": repr(parameters)[:500],
+        "duracion_ms": round(duracion * 1000, 3),
+    })
+
+
+def leer_reporte(config: ProfilingConfig, profile_id: str):
+    path = os.path.join(config.directory, f"{os.path.basename(profile_id)}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _guardar_reporte(path: str, reporte):
+    with open(path, "w") as f:
+        json.dump(reporte, f, ensure_ascii=False)
+
+
+def instalar_profiling(app, config: ProfilingConfig):
+    """
+    Agrega el middleware de profiling a la app. Se captura una petición si trae
+    el header `X-Profile: 1` o `?profile=1`, o si cae en la muestra aleatoria
+    (PROFILING_SAMPLE_RATE). Si el modo está apagado no se instala nada.
+
+    Limitación: el event loop es un solo hilo para todas las peticiones async.
+    Con varias capturas activas a la vez sus muestras se descartan, y con una
+    sola pueden incluir trabajo de peticiones async no capturadas.
+    """
+    if not config.enabled:
+        return
+
+    os.makedirs(config.directory, exist_ok=True)
+    muestreador = Muestreador(config.interval)
+    _instalar_threadpool()
+    for motor in (engine, async_engine.sync_engine):
+        event.listen(motor, "before_cursor_execute", _antes_de_ejecutar)
+        event.listen(motor, "after_cursor_execute", _despues_de_ejecutar)
+
+    @app.middleware("http")
+    async def profiling_middleware(request, call_next):
+        pedido = (
+            request.headers.get("x-profile", "").lower() in ("1", "true")
+            or request.query_params.get("profile", "").lower() in ("1", "true")
+        )
+        if not pedido and not (config.sample_rate > 0 and random.random() < config.sample_rate):
+            return await call_next(request)
+
+        captura = Captura(config.interval)
+        token = _captura_actual.set(captura)
+        # Hilo del event loop: ahí corren los endpoints async y el propio middleware
+        captura.hilo_loop = threading.get_ident()
+        muestreador.agregar(captura)
+        inicio = time.perf_counter()
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+        finally:
+            duracion = time.perf_counter() - inicio
+            muestreador.quitar(captura)
+            _captura_actual.reset(token)
+            reporte = captura.reporte(request, status_code, duracion, "pedido" if pedido else "muestreo")
+            # Escritura en disco fuera del event loop
+            await run_in_threadpool(_guardar_reporte, os.path.join(config.directory, f"{captura.id}.json"), reporte)
+
+        if pedido:
+            response.headers["X-Profile-Id"] = captura.id
+        return response
@@ -0,0 +1,162 @@
+import re
+import copy
+import json
+
+# === MESES (como se guardan en location_ghi) y su abreviatura para el prompt ===
+MONTH_ORDER = [
+    "ENERO", "FEBRERO", "MARZO", "ABRIL", "MAYO", "JUNIO",
+    "JULIO", "AGOSTO", "SEPTIEMBRE", "OCTUBRE", "NOVIEMBRE", "DICIEMBRE"
+]
+MONTH_ABBR = [m[:3] for m in MONTH_ORDER]
+
+# Presupuesto por defecto de tokens de entrada por llamada al modelo
+MAX_PROMPT_TOKENS = 6000
+
+
+# === ESQUEMA DE RESPUESTA (modo JSON con esquema de Gemini) ===
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "predicciones": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    # Identificador exacto del bloque "## ..." del prompt: "Nombre (Departamento)"
+                    "municipio": {"type": "string"},
+                    "valores": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "month": {"type": "string"},
+                                "year": {"type": "integer"},
+                                "value_kwh": {"type": "number"},
+                            },
+                            "required": ["month", "year", "value_kwh"],
+                        },
+                    },
+                    "metadatos_prediccion": {
+                        "type": "object",
+                        "properties": {
+                            "metodo_usado": {"type": "string"},
+                            "margen_error_estimado": {"type": "string"},
+                            "unidad": {"type": "string"},
+                            "precision_estimada_pct": {"type": "number"},
+                        },
+                        "required": ["metodo_usado", "margen_error_estimado", "unidad"],
+                    },
+                },
+                "required": ["municipio", "valores", "metadatos_prediccion"],
+            },
+        }
+    },
+    "required": ["predicciones"],
+}
+
+
+def esquema_lote(claves):
+    """RESPONSE_SCHEMA con "municipio" restringido a las claves del lote (enum)."""
+    esquema = copy.deepcopy(RESPONSE_SCHEMA)
+    municipio = esquema["properties"]["predicciones"]["items"]["properties"]["municipio"]
+    municipio["enum"] = list(claves)
+    return esquema
+
+
+def clave_municipio(nombre: str, departamento: str = None) -> str:
+    """Identificador del municipio en el prompt y la respuesta: "Sabanalarga (Atlántico)"."""
+    return f"{nombre} ({departamento})" if departamento else nombre
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimación rápida (~4 caracteres por token) sin llamar al tokenizador."""
+    return len(texto) // 4 + 1
+
+
+# === CODIFICACIÓN COMPACTA DEL HISTÓRICO ===
+def codificar_historial(historical_data, max_tokens: int = None) -> str:
+    """
+    Convierte [{"month", "year", "value_kwh"}, ...] en una tabla de una fila
+    por año con los 12 meses separados por espacios ("-" si falta el mes):
+
+        2019|5.81 6.06 5.97 ...
+
+    Si se da `max_tokens`, se descartan los años más antiguos hasta que la
+    tabla quepa en el presupuesto (siempre se conserva al menos un año).
+    """
+    por_anio = {}
+    for item in historical_data:
+        month = item["month"].upper()
+        if month not in MONTH_ORDER:
+            continue
+        por_anio.setdefault(item["year"], [None] * 12)[MONTH_ORDER.index(month)] = item["value_kwh"]
+
+    filas = [
+        f"{anio}|" + " ".join("-" if v is None else f"{v:.2f}" for v in valores)
+        for anio, valores in sorted(por_anio.items())
+    ]
+
+    if max_tokens is not None:
+        while len(filas) > 1 and estimar_tokens("\n".join(filas)) > max_tokens:
+            filas.pop(0)
+
+    return "\n".join(filas)
+
+
+# === PROMPT POR LOTES ===
+def construir_prompt(municipios, anio: int, start_month: str, end_month: str) -> str:
+    """
+    `municipios` es una lista de {"municipality": str, "historial": str} con el
+    historial ya codificado por `codificar_historial`; "municipality" debe ser
+    único dentro del lote (ver `clave_municipio`).
+    """
+    bloques = "\n\n".join(f"## {m['municipality']}\n{m['historial']}" for m in municipios)
+    return f"""Eres experto en energía solar y pronóstico de series temporales.
+Pronostica el GHI promedio mensual (kWh/m²/día) de {start_month} a {end_month} de {anio} para cada municipio, usando Holt-Winters sobre su histórico.
+Histórico: una fila por año, "año|{' '.join(MONTH_ABBR)}", "-" = sin dato.
+
+{bloques}
+
+Devuelve una entrada en "predicciones" por municipio, con "municipio" igual al texto exacto tras "## " (incluido el departamento entre paréntesis), con "valores" solo para los meses pedidos (month en mayúsculas, ej. ENERO) y "metadatos_prediccion" (unidad "kWh/m²/día")."""
+
+
+def agrupar_por_presupuesto(municipios, max_tokens: int = MAX_PROMPT_TOKENS):
+    """Reparte los municipios en lotes cuyo histórico codificado quepa en `max_tokens`."""
+    lotes, actual, usados = [], [], 0
+    for m in municipios:
+        costo = estimar_tokens(m["historial"]) + estimar_tokens(m["municipality"]) + 2
+        if actual and usados + costo > max_tokens:
+            lotes.append(actual)
+            actual, usados = [], 0
+        actual.append(m)
+        usados += costo
+    if actual:
+        lotes.append(actual)
+    return lotes
+
+
+# === PARSEO ROBUSTO DE LA RESPUESTA ===
+_FENCE_RE = re.compile(r"^\s*```[a-zA-Z]*\s*|\s*```\s*$")
+
+
+def parsear_respuesta(texto: str):
+    """
+    Extrae el primer valor JSON de la respuesta del modelo. Tolera bloques
+    ```json ... ``` y texto antes o después del JSON. Lanza ValueError si no
+    hay JSON válido.
+    """
+    limpio = _FENCE_RE.sub("", texto.strip())
+    try:
+        return json.loads(limpio)
+    except json.JSONDecodeError:
+        pass
+
+    decoder = json.JSONDecoder()
+    for match in re.finditer(r"[{\[]", limpio):
+        try:
+            valor, _ = decoder.raw_decode(limpio, match.start())
+            return valor
+        except json.JSONDecodeError:
+            continue
+
+    raise ValueError("La respuesta del modelo no contiene un JSON válido")
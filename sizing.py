@@ -0,0 +1,136 @@
+import numpy as np
+from sqlalchemy import func
+
+from models import Location, LocationGHI
+
+MONTH_ORDER = [
+    "ENERO", "FEBRERO", "MARZO", "ABRIL", "MAYO", "JUNIO",
+    "JULIO", "AGOSTO", "SEPTIEMBRE", "OCTUBRE", "NOVIEMBRE", "DICIEMBRE"
+]
+DIAS_MES = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+# === CATÁLOGO POR DEFECTO ===
+# Paneles genéricos de referencia (área en m², eficiencia 0-1, costo en USD por
+# panel, degradación anual 0-1). Se puede reemplazar enviando otro catálogo.
+CATALOGO_PANELES = [
+    {"modelo": "Policristalino 330W", "area_m2": 1.95, "eficiencia": 0.18, "costo": 95.0, "degradacion_anual": 0.007},
+    {"modelo": "Mono PERC 370W", "area_m2": 1.95, "eficiencia": 0.19, "costo": 110.0, "degradacion_anual": 0.0055},
+    {"modelo": "Mono PERC 390W", "area_m2": 1.95, "eficiencia": 0.20, "costo": 122.0, "degradacion_anual": 0.005},
+    {"modelo": "Mono PERC 410W", "area_m2": 1.95, "eficiencia": 0.21, "costo": 135.0, "degradacion_anual": 0.005},
+    {"modelo": "TOPCon 430W", "area_m2": 1.95, "eficiencia": 0.22, "costo": 150.0, "degradacion_anual": 0.004},
+    {"modelo": "Mono PERC 550W", "area_m2": 2.58, "eficiencia": 0.213, "costo": 175.0, "degradacion_anual": 0.0055},
+    {"modelo": "HJT 450W", "area_m2": 1.95, "eficiencia": 0.23, "costo": 180.0, "degradacion_anual": 0.0025},
+]
+
+
+def validar_catalogo(catalogo):
+    """Lanza ValueError si algún panel no tiene valores numéricos válidos."""
+    if not catalogo:
+        raise ValueError("El catálogo no puede estar vacío")
+    campos = ("modelo", "area_m2", "eficiencia", "costo", "degradacion_anual")
+    for i, panel in enumerate(catalogo):
+        faltantes = [c for c in campos if c not in panel]
+        if faltantes:
+            raise ValueError(f"Panel {i}: faltan los campos {', '.join(faltantes)}")
+        for campo in campos[1:]:
+            valor = panel[campo]
+            if isinstance(valor, bool) or not isinstance(valor, (int, float)) or not np.isfinite(valor):
+                raise ValueError(f"Panel {i}: '{campo}' debe ser numérico")
+        for campo in ("area_m2", "eficiencia", "costo"):
+            if panel[campo] <= 0:
+                raise ValueError(f"Panel {i}: '{campo}' debe ser mayor que 0")
+        if not 0 <= panel["degradacion_anual"] < 1:
+            raise ValueError(f"Panel {i}: 'degradacion_anual' debe estar entre 0 y 1 (sin incluir 1)")
+
+
+def perfil_mensual(session, municipality_id: int) -> np.ndarray:
+    """GHI promedio (kWh/m²/día) de cada mes calendario, sobre todos los años y ubicaciones."""
+    rows = (
+        session.query(LocationGHI.month, func.avg(LocationGHI.value_kwh))
+        .join(Location, LocationGHI.location_id == Location.id)
+        .filter(Location.municipality_id == municipality_id, LocationGHI.month.in_(MONTH_ORDER))
+        .group_by(LocationGHI.month)
+        .all()
+    )
+    valores = dict(rows)
+    if len(valores) < 12:
+        return None
+    return np.array([valores[m] for m in MONTH_ORDER])
+
+
+def dimensionar(catalogo, ghi_mensual, objetivos_kwh_dia, performance_ratio: float = 0.8, vida_util_anios: int = 25):
+    """
+    Evalúa catálogo × mes × objetivo en un solo broadcast de NumPy.
+
+    Para cada panel y objetivo (kWh/día) calcula cuántos paneles se necesitan
+    para cubrir el objetivo en el peor mes al final de la vida útil (con la
+    degradación acumulada). Devuelve arreglos (P, T) más el mes crítico de
+    cada panel.
+    """
+    area = np.array([p["area_m2"] for p in catalogo], dtype=float)[:, None, None]
+    eficiencia = np.array([p["eficiencia"] for p in catalogo], dtype=float)[:, None, None]
+    degradacion = np.array([p["degradacion_anual"] for p in catalogo], dtype=float)[:, None, None]
+    costo = np.array([p["costo"] for p in catalogo], dtype=float)[:, None]
+    ghi = np.asarray(ghi_mensual, dtype=float)[None, :, None]
+    objetivos = np.asarray(objetivos_kwh_dia, dtype=float)[None, None, :]
+
+    # Energía diaria por panel (P, 12, 1): año 1 y fin de vida útil
+    energia_panel = ghi * area * eficiencia * performance_ratio
+    energia_panel_fin = energia_panel * (1 - degradacion) ** vida_util_anios
+
+    # Paneles necesarios por mes (P, 12, T); el peor mes define el diseño
+    paneles_por_mes = np.ceil(objetivos / energia_panel_fin)
+    paneles = paneles_por_mes.max(axis=1).astype(int)
+
+    energia_anual_panel = (energia_panel[:, :, 0] * DIAS_MES).sum(axis=1)[:, None]  # (P, 1) kWh/año
+    return {
+        "paneles": paneles,
+        "costo_total": paneles * costo,
+        "energia_anual_kwh": paneles * energia_anual_panel,
+        "energia_peor_mes_kwh_dia": paneles * energia_panel_fin.min(axis=1),
+        "area_total_m2": paneles * area[:, :, 0],
+        "mes_critico": energia_panel_fin[:, :, 0].argmin(axis=1),
+    }
+
+
+def frente_pareto(costo: np.ndarray, energia: np.ndarray) -> np.ndarray:
+    """
+    Máscara (P, T) de las configuraciones no dominadas por columna: ninguna
+    otra del mismo objetivo cuesta menos (o igual) y genera más energía.
+    """
+    orden = np.lexsort((-energia, costo), axis=0)
+    energia_ordenada = np.take_along_axis(energia, orden, axis=0)
+    maximo_previo = np.maximum.accumulate(energia_ordenada, axis=0)
+    maximo_previo = np.vstack([np.full((1, energia.shape[1]), -np.inf), maximo_previo[:-1]])
+
+    mascara = np.zeros_like(energia, dtype=bool)
+    np.put_along_axis(mascara, orden, energia_ordenada > maximo_previo, axis=0)
+    return mascara
+
+
+def reporte_dimensionamiento(catalogo, ghi_mensual, objetivos_kwh_dia, top: int = 10, **kwargs):
+    """Arma la respuesta por objetivo: las `top` opciones más baratas y el frente costo/energía."""
+    r = dimensionar(catalogo, ghi_mensual, objetivos_kwh_dia, **kwargs)
+    pareto = frente_pareto(r["costo_total"], r["energia_anual_kwh"])
+
+    def opcion(p, t):
+        return {
+            "modelo": catalogo[p]["modelo"],
+            "cantidad_paneles": int(r["paneles"][p, t]),
+            "costo_total": round(float(r["costo_total"][p, t]), 2),
+            "energia_anual_kwh": round(float(r["energia_anual_kwh"][p, t]), 1),
+            "energia_peor_mes_kwh_dia": round(float(r["energia_peor_mes_kwh_dia"][p, t]), 2),
+            "area_total_m2": round(float(r["area_total_m2"][p, t]), 2),
+            "mes_critico": MONTH_ORDER[r["mes_critico"][p]],
+        }
+
+    resultado = []
+    for t, objetivo in enumerate(objetivos_kwh_dia):
+        por_costo = np.argsort(r["costo_total"][:, t], kind="stable")
+        frente = [p for p in por_costo if pareto[p, t]]
+        resultado.append({
+            "energia_deseada_kwh_dia": objetivo,
+            "opciones": [opcion(p, t) for p in por_costo[:top]],
+            "frente_pareto": [opcion(p, t) for p in frente],
+        })
+    return resultado
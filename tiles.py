@@ -0,0 +1,274 @@
+import os
+import json
+import math
+import zlib
+import struct
+import shutil
+import argparse
+import threading
+
+import numpy as np
+from sqlalchemy import func
+
+from database import SessionLocal
+from models import Location, LocationGHI
+
+MONTH_ORDER = [
+    "ENERO", "FEBRERO", "MARZO", "ABRIL", "MAYO", "JUNIO",
+    "JULIO", "AGOSTO", "SEPTIEMBRE", "OCTUBRE", "NOVIEMBRE", "DICIEMBRE"
+]
+
+TILES_DIR = "tiles"
+TILE_SIZE = 256
+ZOOMS = range(5, 10)
+GRID_RES = 0.02        # resolución de la grilla lat/lon en grados
+GRID_MARGEN = 0.5      # grados alrededor de las ubicaciones
+MAX_DIST = 0.5         # más lejos que esto (grados) de toda ubicación el píxel queda transparente
+MEMORIA_IDW = 64 * 2**20  # bytes de temporales por bloque de filas en la interpolación
+GHI_MIN, GHI_MAX = 3.5, 7.0  # rango fijo de la escala de color (kWh/m²/día)
+
+# Evita que el arranque de la API y una ingesta regeneren los mismos tiles a la vez
+_regenerando = threading.Lock()
+
+# Escala de color amarillo → naranja → rojo oscuro (paradas RGB)
+_ESCALA = np.array([
+    [255, 255, 178],
+    [254, 204, 92],
+    [253, 141, 60],
+    [240, 59, 32],
+    [189, 0, 38],
+], dtype=float)
+
+
+# === PNG SIN DEPENDENCIAS ===
+def codificar_png(rgba: np.ndarray) -> bytes:
+    """Codifica un arreglo (alto, ancho, 4) uint8 como PNG RGBA."""
+    alto, ancho, _ = rgba.shape
+    filas = np.hstack([np.zeros((alto, 1), dtype=np.uint8), rgba.reshape(alto, ancho * 4)])
+
+    def chunk(tipo, datos):
+        return struct.pack(">I", len(datos)) + tipo + datos + struct.pack(">I", zlib.crc32(tipo + datos) & 0xFFFFFFFF)
+
+    cabecera = struct.pack(">IIBBBBB", ancho, alto, 8, 6, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", cabecera)
+        + chunk(b"IDAT", zlib.compress(filas.tobytes(), 6))
+        + chunk(b"IEND", b"")
+    )
+
+
+TILE_VACIO = codificar_png(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8))
+
+
+def colorear(valores: np.ndarray) -> np.ndarray:
+    """GHI → RGBA; los NaN quedan transparentes."""
+    t = np.clip((valores - GHI_MIN) / (GHI_MAX - GHI_MIN), 0, 1) * (len(_ESCALA) - 1)
+    t = np.nan_to_num(t)
+    i = np.minimum(t.astype(int), len(_ESCALA) - 2)
+    frac = (t - i)[..., None]
+    rgb = _ESCALA[i] * (1 - frac) + _ESCALA[i + 1] * frac
+
+    rgba = np.zeros(valores.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = rgb.astype(np.uint8)
+    rgba[..., 3] = np.where(np.isnan(valores), 0, 200)
+    return rgba
+
+
+# === INTERPOLACIÓN A GRILLA REGULAR ===
+def cargar_puntos(session, year: int, month: str):
+    """Latitud, longitud y GHI promedio (kWh/m²/día) de cada ubicación para un año/mes."""
+    rows = (
+        session.query(Location.latitude, Location.longitude, func.avg(LocationGHI.value_kwh))
+        .join(LocationGHI, LocationGHI.location_id == Location.id)
+        .filter(LocationGHI.year == year, LocationGHI.month == month)
+        .group_by(Location.id)
+        .all()
+    )
+    if not rows:
+        return None
+    return np.array(rows, dtype=float).T
+
+
+def interpolar_grilla(lat, lon, valores, potencia: float = 2.0):
+    """
+    Interpolación IDW sobre una grilla regular que cubre las ubicaciones.
+    Devuelve (grilla[alto, ancho], lat_max, lon_min); la fila 0 es la latitud más al norte.
+    """
+    lat_max = lat.max() + GRID_MARGEN
+    lon_min = lon.min() - GRID_MARGEN
+    lats = np.arange(lat_max, lat.min() - GRID_MARGEN, -GRID_RES, dtype=np.float32)
+    lons = np.arange(lon_min, lon.max() + GRID_MARGEN, GRID_RES, dtype=np.float32)
+
+    grilla = np.empty((len(lats), len(lons)), dtype=np.float32)
+    lat_p, lon_p, val_p = (np.asarray(a, dtype=np.float32) for a in (lat, lon, valores))
+
+    # Por bloques de filas para no crear una matriz píxeles × puntos gigante. Cada bloque
+    # crea ~4 temporales float32 de (filas, ancho, puntos); las filas salen de MEMORIA_IDW
+    # para que el pico no crezca con la cantidad de ubicaciones.
+    filas = max(1, MEMORIA_IDW // (4 * 4 * len(lons) * len(lat_p)))
+    dlon2 = (lons[:, None] - lon_p[None, :]) ** 2
+    for inicio in range(0, len(lats), filas):
+        bloque = lats[inicio:inicio + filas]
+        dist2 = (bloque[:, None, None] - lat_p[None, None, :]) ** 2 + dlon2[None, :, :]
+        cercano = dist2.min(axis=2)
+        pesos = np.maximum(dist2, 1e-12, out=dist2) ** (-potencia / 2)
+        interpolado = (pesos @ val_p) / pesos.sum(axis=2)
+        interpolado[cercano > MAX_DIST ** 2] = np.nan
+        grilla[inicio:inicio + filas] = interpolado
+
+    return grilla, float(lat_max), float(lon_min)
+
+
+# === TILES (esquema XYZ / Web Mercator) ===
+def latlon_a_tile(lat: float, lon: float, z: int):
+    n = 2 ** z
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return x, y
+
+
+def muestrear_tile(grilla, lat_max, lon_min, z: int, x: int, y: int) -> np.ndarray:
+    """Valores de GHI de los píxeles de un tile (interpolación bilineal sobre la grilla)."""
+    n = 2 ** z
+    pixeles = (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE
+    lons = (x + pixeles) / n * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + pixeles) / n))))
+
+    fila = (lat_max - lats) / GRID_RES
+    col = (lons - lon_min) / GRID_RES
+    alto, ancho = grilla.shape
+    f0 = np.clip(np.floor(fila).astype(int), 0, alto - 2)
+    c0 = np.clip(np.floor(col).astype(int), 0, ancho - 2)
+    df = np.clip(fila - f0, 0, 1)[:, None]
+    dc = np.clip(col - c0, 0, 1)[None, :]
+
+    F, C = f0[:, None], c0[None, :]
+    valores = (
+        grilla[F, C] * (1 - df) * (1 - dc)
+        + grilla[F + 1, C] * df * (1 - dc)
+        + grilla[F, C + 1] * (1 - df) * dc
+        + grilla[F + 1, C + 1] * df * dc
+    )
+    fuera = ((fila < 0) | (fila > alto - 1))[:, None] | ((col < 0) | (col > ancho - 1))[None, :]
+    valores[fuera] = np.nan
+    return valores
+
+
+def ruta_tile(year: int, month: str, z: int, x: int, y: int, base: str = TILES_DIR) -> str:
+    return os.path.join(base, str(year), month, str(z), str(x), f"{y}.png")
+
+
+def _escribir_atomico(ruta: str, escribir):
+    """Escribe en `ruta.tmp` y lo renombra: quien lee ve el archivo viejo o el nuevo, nunca uno a medias."""
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "wb") as f:
+        escribir(f)
+    os.replace(temporal, ruta)
+
+
+def generar_tiles(session, year: int, month: str, zooms=ZOOMS, base: str = TILES_DIR) -> int:
+    """
+    Interpola un año/mes y escribe su grilla (.npz) y sus tiles PNG. Devuelve los tiles escritos.
+
+    Los tiles se reemplazan uno a uno de forma atómica y al final se borran los
+    que ya no corresponden, así /tiles sigue sirviendo durante la regeneración.
+    """
+    puntos = cargar_puntos(session, year, month)
+    destino = os.path.join(base, str(year), month)
+    if puntos is None:
+        shutil.rmtree(destino, ignore_errors=True)
+        return 0
+
+    lat, lon, valores = puntos
+    grilla, lat_max, lon_min = interpolar_grilla(lat, lon, valores)
+    _escribir_atomico(
+        os.path.join(destino, "grid.npz"),
+        lambda f: np.savez_compressed(f, grilla=grilla, lat_max=lat_max, lon_min=lon_min, res=GRID_RES),
+    )
+
+    lat_min = lat_max - grilla.shape[0] * GRID_RES
+    lon_max = lon_min + grilla.shape[1] * GRID_RES
+    escritos = set()
+    for z in zooms:
+        x0, y0 = latlon_a_tile(lat_max, lon_min, z)
+        x1, y1 = latlon_a_tile(lat_min, lon_max, z)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                tile = muestrear_tile(grilla, lat_max, lon_min, z, x, y)
+                if np.isnan(tile).all():
+                    continue
+                ruta = ruta_tile(year, month, z, x, y, base)
+                png = codificar_png(colorear(tile))
+                _escribir_atomico(ruta, lambda f: f.write(png))
+                escritos.add(os.path.normpath(ruta))
+
+    # Tiles de una generación anterior que ya no tienen datos
+    for carpeta, _, archivos in os.walk(destino, topdown=False):
+        for archivo in archivos:
+            ruta = os.path.normpath(os.path.join(carpeta, archivo))
+            if archivo.endswith((".png", ".tmp")) and ruta not in escritos:
+                os.remove(ruta)
+        if carpeta != destino and not os.listdir(carpeta):
+            os.rmdir(carpeta)
+    return len(escritos)
+
+
+# === REGENERACIÓN INCREMENTAL ===
+def huellas(session):
+    """Huella (cantidad, suma) de los valores de cada año/mes para detectar cambios."""
+    rows = (
+        session.query(LocationGHI.year, LocationGHI.month, func.count(LocationGHI.id), func.sum(LocationGHI.value_kwh))
+        .filter(LocationGHI.month.in_(MONTH_ORDER))
+        .group_by(LocationGHI.year, LocationGHI.month)
+        .all()
+    )
+    return {f"{year}-{month}": [count, round(total, 4)] for year, month, count, total in rows}
+
+
+def regenerar_tiles(zooms=ZOOMS, base: str = TILES_DIR, forzar: bool = False):
+    """Regenera solo los años/meses cuyos datos cambiaron desde la última generación."""
+    with _regenerando:
+        return _regenerar_tiles(zooms, base, forzar)
+
+
+def _regenerar_tiles(zooms, base, forzar):
+    manifiesto_path = os.path.join(base, "manifest.json")
+    manifiesto = {}
+    if os.path.exists(manifiesto_path) and not forzar:
+        with open(manifiesto_path) as f:
+            manifiesto = json.load(f)
+
+    session = SessionLocal()
+    try:
+        actuales = huellas(session)
+        cambiados = [clave for clave, huella in actuales.items() if manifiesto.get(clave) != huella]
+        for clave in cambiados:
+            year, month = clave.split("-", 1)
+            escritos = generar_tiles(session, int(year), month, zooms, base)
+            manifiesto[clave] = actuales[clave]
+            print(f"🗺️ {escritos} tiles generados para {month} {year}")
+    finally:
+        session.close()
+
+    os.makedirs(base, exist_ok=True)
+    with open(manifiesto_path, "w") as f:
+        json.dump(manifiesto, f)
+    return cambiados
+
+
+def regenerar_en_segundo_plano():
+    """Lanza `regenerar_tiles` en un hilo aparte (no bloquea al que llama, p. ej. el worker de ingesta)."""
+    hilo = threading.Thread(target=regenerar_tiles, daemon=True, name="tiles")
+    hilo.start()
+    return hilo
+
+
+# === EJECUCIÓN ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera los tiles de GHI interpolado por año y mes")
+    parser.add_argument("--forzar", action="store_true", help="Regenera todo aunque no haya cambios")
+    args = parser.parse_args()
+
+    regenerar_tiles(forzar=args.forzar)